@@ -4,4 +4,8 @@ from django.apps import AppConfig
 class AuthenticationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'authentication'
-    verbose_name = 'Authentication'
\ No newline at end of file
+    verbose_name = 'Authentication'
+
+    def ready(self):
+        """Import signal handlers when app is ready."""
+        import authentication.signals  # noqa: F401
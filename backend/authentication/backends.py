@@ -0,0 +1,47 @@
+"""
+Cached user lookup for session-authenticated requests.
+
+Every authenticated request resolves the session's user id to a User.  The
+session itself is served from the cache by the cached_db engine; this backend
+does the same for the user, so an admin request normally authenticates
+without touching the database.  Entries live in the SESSION_CACHE_ALIAS cache,
+which every worker must share, and are dropped when the user is saved or
+deleted and on logout (see authentication.signals).  A password change
+saves the user, so the session hash check still logs other sessions out.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+CACHE_PREFIX = 'authentication:user'
+
+
+def user_cache():
+    return caches[settings.SESSION_CACHE_ALIAS]
+
+
+def cache_key(user_id):
+    return f'{CACHE_PREFIX}:{user_id}'
+
+
+def cache_user(user):
+    """Store a freshly loaded user for later requests."""
+    user_cache().set(cache_key(user.pk), user, settings.USER_CACHE_TIMEOUT)
+
+
+def forget_user(user_id):
+    user_cache().delete(cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose get_user() is answered from the cache when it can be."""
+
+    def get_user(self, user_id):
+        user = user_cache().get(cache_key(user_id))
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache_user(user)
+        elif not self.user_can_authenticate(user):
+            return None
+        return user
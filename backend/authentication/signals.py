@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import cache_user, forget_user
+
+
+@receiver(user_logged_in)
+def user_logged_in_cache(sender, user, **kwargs):
+    """Prime the user cache, so the requests after login skip the user query."""
+    cache_user(user)
+
+
+@receiver(user_logged_out)
+def user_logged_out_cache(sender, user, **kwargs):
+    """Drop the cached user when a session logs out."""
+    if user is not None:
+        forget_user(user.pk)
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    """Drop the cached user on any write, including password changes."""
+    forget_user(instance.pk)
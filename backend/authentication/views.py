@@ -3,11 +3,13 @@ from django.contrib.auth.models import User
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import serializers
 
+from memories.throttling import scoped_throttle
+
 
 class LoginSerializer(serializers.Serializer):
     """Serializer for login credentials."""
@@ -31,6 +33,7 @@ class UserSerializer(serializers.ModelSerializer):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([scoped_throttle('admin-login')])
 def admin_login(request):
     """Handle admin login."""
     serializer = LoginSerializer(data=request.data)
@@ -104,6 +107,7 @@ def admin_status(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([scoped_throttle('admin-create')])
 def create_admin_user(request):
     """Create initial admin user (for development setup)."""
     # This should be protected in production
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Memory, SiteSettings
+from .models import MediaAsset, Memory, SiteSettings
+from .search import search_memories
 
 
 @admin.register(Memory)
@@ -39,6 +40,12 @@ class MemoryAdmin(admin.ModelAdmin):
             return qs
         return qs.filter(is_secret=False)
 
+    def get_search_results(self, request, queryset, search_term):
+        """Search through the full-text index instead of icontains scans."""
+        if not search_term.strip():
+            return queryset, False
+        return search_memories(queryset, search_term), False
+
 
 @admin.register(SiteSettings)
 class SiteSettingsAdmin(admin.ModelAdmin):
@@ -68,4 +75,14 @@ class SiteSettingsAdmin(admin.ModelAdmin):
         """Only allow one instance of SiteSettings."""
         if SiteSettings.objects.exists():
             return False
-        return super().has_add_permission(request)
\ No newline at end of file
+        return super().has_add_permission(request)
+
+
+@admin.register(MediaAsset)
+class MediaAssetAdmin(admin.ModelAdmin):
+    """Admin interface for uploaded media and their derivatives."""
+
+    list_display = ['name', 'status', 'width', 'height', 'updated_at']
+    list_filter = ['status']
+    search_fields = ['name']
+    readonly_fields = ['name', 'width', 'height', 'variants', 'status', 'created_at', 'updated_at']
\ No newline at end of file
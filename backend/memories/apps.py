@@ -7,7 +7,8 @@ class MemoriesConfig(AppConfig):
     verbose_name = 'Memories'
 
     def ready(self):
-        """Import signal handlers when app is ready."""
+        """Import signal handlers and system checks when app is ready."""
+        import memories.checks  # noqa: F401
         try:
             import memories.signals
         except ImportError:
@@ -0,0 +1,137 @@
+"""
+Content-addressed, deduplicated media storage.
+
+Uploads are hashed while Django streams them in (HashingUploadHandler) and
+stored once under blobs/<aa>/<bb>/<sha256>.<ext>.  A repeat upload of the same
+bytes returns the existing blob without writing anything.  Each MediaBlob
+counts the memories whose media_url points at it; blobs nobody references
+are collected in bulk by the gc_media_blobs command.
+"""
+import hashlib
+import os
+
+from django.core.files.base import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db.models import F
+from django.utils import timezone
+
+from .derivatives import storage_name_for_url
+from .models import MediaBlob
+
+BLOBS_DIR = 'blobs'
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """Compute a SHA-256 of every uploaded file while its chunks stream in."""
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.digests = {}
+        self._hash = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._hash = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._hash.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.digests[self.field_name] = self._hash.hexdigest()
+        # Let the next handler build the UploadedFile.
+        return None
+
+
+def uploaded_digest(request, field_name, uploaded_file):
+    """SHA-256 of an uploaded file, from the hashing handler or by reading it."""
+    for handler in request.upload_handlers:
+        if isinstance(handler, HashingUploadHandler) and field_name in handler.digests:
+            return handler.digests[field_name]
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def blob_name(sha256, extension):
+    return f'{BLOBS_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}.{extension}'
+
+
+def store_upload(uploaded_file, sha256):
+    """
+    Store an uploaded file under its content address.
+
+    Returns (MediaBlob, created); when the content is already stored nothing
+    is written and the existing blob is returned.
+    """
+    existing = MediaBlob.objects.filter(sha256=sha256).first()
+    if existing is not None and _reuse(existing):
+        return existing, False
+
+    extension = uploaded_file.name.split('.')[-1].lower()
+    name = blob_name(sha256, extension)
+    if not default_storage.exists(name):
+        name = default_storage.save(name, uploaded_file)
+    return _register(sha256, name, uploaded_file.size)
+
+
+def adopt_file(path, sha256, extension):
+    """
+    Move a complete local file into blob storage, consuming it.
+
+    Returns (MediaBlob, created) like store_upload; a duplicate is discarded.
+    """
+    existing = MediaBlob.objects.filter(sha256=sha256).first()
+    if existing is not None and _reuse(existing):
+        os.unlink(path)
+        return existing, False
+
+    name = blob_name(sha256, extension)
+    size = os.path.getsize(path)
+    if default_storage.exists(name):
+        os.unlink(path)
+    else:
+        try:
+            destination = default_storage.path(name)
+        except NotImplementedError:
+            with open(path, 'rb') as source:
+                name = default_storage.save(name, File(source))
+            os.unlink(path)
+        else:
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            file_move_safe(path, destination)
+    return _register(sha256, name, size)
+
+
+def _reuse(blob):
+    """
+    Restart the GC grace period of a blob being handed out again, so an
+    unreferenced one is not collected before its new memory is saved.
+    False when the blob has been collected meanwhile.
+    """
+    return MediaBlob.objects.filter(pk=blob.pk).update(updated_at=timezone.now()) == 1
+
+
+def _register(sha256, name, size):
+    blob, created = MediaBlob.objects.get_or_create(
+        sha256=sha256, defaults={'name': name, 'size': size}
+    )
+    if not created and blob.name != name:
+        # A concurrent upload of the same bytes won; drop our copy.
+        default_storage.delete(name)
+    return blob, created
+
+
+def adjust_references(url, delta):
+    """Add `delta` to the reference count of the blob behind a media URL."""
+    name = storage_name_for_url(url)
+    if not name or not name.startswith(f'{BLOBS_DIR}/'):
+        return
+    queryset = MediaBlob.objects.filter(name=name)
+    if delta < 0:
+        queryset = queryset.filter(ref_count__gte=-delta)
+    queryset.update(ref_count=F('ref_count') + delta, updated_at=timezone.now())
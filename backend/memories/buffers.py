@@ -0,0 +1,67 @@
+"""
+Packed binary position buffers for GPU instancing.
+
+The public memory set is exported as little-endian Float32 records of
+(x, y, z, orbit_radius), with a JSON index of memory ids in the same order.
+Both are built together from a single query and cached under the memories
+collection version, so they always describe the same snapshot.
+"""
+import json
+
+import numpy as np
+from django.core.cache import cache
+
+from .models import Memory
+from .versioning import MEMORIES, get_versions
+
+POSITION_FIELDS = ('position_x', 'position_y', 'position_z', 'orbit_radius')
+POSITION_STRIDE = len(POSITION_FIELDS)
+POSITION_DTYPE = np.dtype('<f4')
+POSITION_CACHE_TIMEOUT = 60 * 60
+
+
+class PositionBundle:
+    """A packed position buffer and its id index for one collection version."""
+
+    def __init__(self, version, count, buffer, index):
+        self.version = version
+        self.count = count
+        self.buffer = buffer
+        self.index = index
+
+
+def build_position_bundle(version):
+    """Query the public memories once and pack positions column-wise with NumPy."""
+    rows = list(
+        Memory.objects.filter(is_secret=False)
+        .order_by('order', 'date', 'id')
+        .values_list('id', *POSITION_FIELDS)
+    )
+    if rows:
+        ids, *columns = zip(*rows)
+        buffer = np.array(columns, dtype=POSITION_DTYPE).T.tobytes()
+    else:
+        ids, buffer = (), b''
+
+    index = json.dumps(
+        {
+            'version': version,
+            'count': len(ids),
+            'stride': POSITION_STRIDE,
+            'fields': ['x', 'y', 'z', 'orbit_radius'],
+            'ids': list(map(str, ids)),
+        },
+        separators=(',', ':')
+    ).encode('utf-8')
+    return PositionBundle(version, len(ids), buffer, index)
+
+
+def get_position_bundle():
+    """Return the position bundle for the current memories version, building on a miss."""
+    version, = get_versions(MEMORIES)
+    key = f'memories:positions:v{version}'
+    bundle = cache.get(key)
+    if bundle is None:
+        bundle = build_position_bundle(version)
+        cache.set(key, bundle, POSITION_CACHE_TIMEOUT)
+    return bundle
\ No newline at end of file
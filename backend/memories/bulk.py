@@ -0,0 +1,200 @@
+"""
+Bulk create, update and delete of memories in a single transaction.
+
+A batch is validated as a whole first; if any operation is invalid nothing
+is written.  The writes then go out as one bulk_create, one bulk_update and
+one DELETE.  None of those send model signals, so the collection version,
+the manifest rebuild, the blob reference counts, the delta-sync
+tombstones and the change-stream event that the signals normally maintain
+are updated here, once for the whole batch.
+"""
+from collections import Counter
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .blobs import adjust_references
+from .layout import free_positions
+from .models import Memory
+from .serializers import MemoryCreateUpdateSerializer
+from .signals import memories_changed_in_bulk
+from .spatial import cells_for_points
+from .sync import record_tombstones
+
+BATCH_SIZE = 500
+
+POSITION_FIELDS = ('position_x', 'position_y', 'position_z')
+
+
+class BulkOperation:
+    """A validated operation, ready to be applied."""
+
+    def __init__(self, index, op, pk=None, instance=None, validated_data=None):
+        self.index = index
+        self.op = op
+        self.pk = pk
+        self.instance = instance
+        self.validated_data = validated_data
+
+
+def run_operations(operations):
+    """
+    Validate and apply parsed operations in one transaction.
+
+    The rows the batch updates or deletes are locked when they are looked up,
+    so none can change or disappear before the writes.  Returns
+    (results, errors); when there are errors nothing was written.
+    """
+    with transaction.atomic():
+        validated, errors = validate_operations(operations)
+        if errors:
+            return None, errors
+        return apply_operations(validated), []
+
+
+def validate_operations(operations):
+    """
+    Validate parsed operations against the database with one lookup query,
+    which locks the target rows: call it inside the applying transaction.
+
+    Returns (BulkOperation list, errors) where errors is a list of
+    {'index', 'op', 'errors'} dicts, empty when the batch can be applied.
+    """
+    ids = [operation['id'] for operation in operations if operation['op'] != 'create']
+    # In primary key order, so concurrent batches lock their rows in the same order.
+    targets = {
+        memory.pk: memory
+        for memory in Memory.objects.select_for_update().filter(pk__in=ids).order_by('pk')
+    }
+    seen = set()
+    validated, errors = [], []
+
+    for index, operation in enumerate(operations):
+        op, pk = operation['op'], operation.get('id')
+        instance = targets.get(pk)
+        item_errors = None
+
+        if op != 'create':
+            if pk in seen:
+                item_errors = {'id': ["Memory appears in more than one operation"]}
+            elif instance is None:
+                item_errors = {'id': ["Memory not found"]}
+            seen.add(pk)
+
+        validated_data = None
+        if item_errors is None and op != 'delete':
+            serializer = MemoryCreateUpdateSerializer(
+                instance, data=operation['data'], partial=op == 'update'
+            )
+            if serializer.is_valid():
+                validated_data = serializer.validated_data
+            else:
+                item_errors = serializer.errors
+
+        if item_errors:
+            errors.append({'index': index, 'op': op, 'errors': item_errors})
+        validated.append(BulkOperation(index, op, pk, instance, validated_data))
+
+    return validated, errors
+
+
+def delete_rows(pks):
+    """
+    DELETE memories by primary key without loading them.  Nothing cascades
+    from Memory, and QuerySet.delete() would send the per-row signals whose
+    bookkeeping apply_operations does once for the batch.
+    """
+    quote = connection.ops.quote_name
+    pk = Memory._meta.pk
+    for start in range(0, len(pks), BATCH_SIZE):
+        batch = [pk.get_db_prep_value(value, connection) for value in pks[start:start + BATCH_SIZE]]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {quote(Memory._meta.db_table)} WHERE {quote(pk.column)} IN '
+                f'({", ".join(["%s"] * len(batch))})',
+                batch
+            )
+
+
+def apply_operations(operations):
+    """
+    Apply validated BulkOperations atomically.
+
+    Returns one {'index', 'op', 'id', 'status'} result per operation, in
+    request order.
+    """
+    now = timezone.now()
+    created, updated, deleted = [], [], []
+    update_fields = {'spatial_cell', 'updated_at'}
+    references = Counter()
+
+    unplaced = [
+        operation for operation in operations
+        if operation.op == 'create' and not operation.validated_data.get('position')
+    ]
+    positions = iter(free_positions(len(unplaced)))
+
+    for operation in operations:
+        if operation.op == 'delete':
+            deleted.append(operation.pk)
+            references[operation.instance.media_url] -= 1
+            continue
+
+        data = dict(operation.validated_data)
+        position = data.pop('position', None)
+        if operation.op == 'create':
+            instance = Memory(**data)
+            if not position:
+                position = dict(zip('xyz', next(positions)))
+            references[instance.media_url] += 1
+            created.append(instance)
+        else:
+            instance = operation.instance
+            if 'media_url' in data and data['media_url'] != instance.media_url:
+                references[instance.media_url] -= 1
+                references[data['media_url']] += 1
+            for field, value in data.items():
+                setattr(instance, field, value)
+            update_fields.update(data)
+            if position:
+                update_fields.update(POSITION_FIELDS)
+            instance.updated_at = now
+            updated.append(instance)
+
+        if position:
+            instance.position_x = position['x']
+            instance.position_y = position['y']
+            instance.position_z = position['z']
+        operation.instance = instance
+
+    placed = created + updated
+    if placed:
+        cells = cells_for_points(
+            [(memory.position_x, memory.position_y, memory.position_z) for memory in placed]
+        )
+        for memory, cell in zip(placed, cells.tolist()):
+            memory.spatial_cell = cell
+
+    with transaction.atomic():
+        if created:
+            Memory.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        if updated:
+            Memory.objects.bulk_update(updated, sorted(update_fields), batch_size=BATCH_SIZE)
+        if deleted:
+            delete_rows(deleted)
+            record_tombstones(deleted, now)
+        for url, delta in references.items():
+            if url and delta:
+                adjust_references(url, delta)
+        memories_changed_in_bulk()
+
+    statuses = {'create': 'created', 'update': 'updated', 'delete': 'deleted'}
+    return [
+        {
+            'index': operation.index,
+            'op': operation.op,
+            'id': str(operation.instance.pk),
+            'status': statuses[operation.op],
+        }
+        for operation in operations
+    ]
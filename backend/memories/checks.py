@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PER_PROCESS_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register(Tags.caches)
+def check_throttle_cache(app_configs, **kwargs):
+    """A per-process throttle cache gives every client one budget per worker."""
+    backend = settings.CACHES.get(settings.THROTTLE_CACHE_ALIAS, {}).get('BACKEND')
+    if settings.WEB_CONCURRENCY > 1 and backend in PER_PROCESS_CACHES:
+        return [Error(
+            f'The {settings.THROTTLE_CACHE_ALIAS!r} cache is private to each of the '
+            f'{settings.WEB_CONCURRENCY} workers, so rate limits are {settings.WEB_CONCURRENCY} '
+            'times too generous.',
+            hint='Set REDIS_URL, or THROTTLE_CACHE_BACKEND to a shared cache.',
+            id='memories.E001',
+        )]
+    return []
@@ -0,0 +1,186 @@
+"""
+Content-negotiated compression of API responses.
+
+JSON and text bodies of at least COMPRESSION_MIN_SIZE bytes are compressed
+with the best coding the client accepts: brotli and zstd when their packages
+are installed, gzip always.  HTML is left alone, so pages carrying a CSRF
+token are not exposed to compression side channels (BREACH).
+
+Responses with a strong ETag (the collection-versioned endpoints) name their
+exact bytes, and the ETag already encodes the URL, the auth scope and the
+collection version.  Their compressed bodies are cached under the ETag in the
+shared cache, with the most recently used also kept in each worker process,
+so a hot page is compressed once per version rather than on every request.
+Entries never go stale: a write bumps the version and so the key.
+bench_compression measures CPU cost against bytes saved.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+
+from .manifest import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+def compress_gzip(data, level):
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compress_brotli(data, level):
+    return brotli.compress(data, quality=level, mode=brotli.MODE_TEXT)
+
+
+def compress_zstd(data, level):
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+# Content coding -> (compress, level), in server preference order.  On a
+# 35 KB memory page brotli 4 saves ~83% in ~0.6 ms and zstd 3 ~82% in a
+# quarter of that; higher levels gain under a point until brotli 11, which
+# takes ~100 ms (bench_compression).
+CODINGS = {
+    name: codec for name, codec in [
+        ('br', (compress_brotli, 4) if brotli is not None else None),
+        ('zstd', (compress_zstd, 3) if zstandard is not None else None),
+        ('gzip', (compress_gzip, 6)),
+    ] if codec is not None
+}
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain', 'text/csv')
+
+CACHE_PREFIX = 'memories:compressed'
+
+
+class LocalCache:
+    """This process's most recently used compressed bodies, within a byte budget."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        budget = settings.COMPRESSION_LOCAL_CACHE_SIZE
+        with self.lock:
+            self.discard(key)
+            if len(entry[1]) > budget:
+                return
+            self.entries[key] = entry
+            self.size += len(entry[1])
+            while self.size > budget:
+                _, dropped = self.entries.popitem(last=False)
+                self.size -= len(dropped[1])
+
+    def discard(self, key):
+        """Drop an entry; the caller holds the lock."""
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+local_cache = LocalCache()
+
+
+def choose_coding(header):
+    """The preferred coding an Accept-Encoding header allows, or None."""
+    accepted = accepted_encodings(header)
+    for coding in CODINGS:
+        if coding in accepted or '*' in accepted:
+            return coding
+    return None
+
+
+def compressible(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return (
+        not response.streaming
+        and not response.has_header('Content-Encoding')
+        and content_type in COMPRESSIBLE_TYPES
+    )
+
+
+def cache_key(request, coding, etag):
+    user = getattr(request, 'user', None)
+    scope = 'auth' if user is not None and user.is_authenticated else 'public'
+    digest = hashlib.sha1(f'{scope}|{request.get_full_path()}|{etag}'.encode('utf-8')).hexdigest()
+    return f'{CACHE_PREFIX}:{coding}:{digest}'
+
+
+def compress_body(request, response, coding):
+    """
+    The compressed body of `response`, from the cache when it has a strong
+    ETag and was compressed before.
+    """
+    compress, level = CODINGS[coding]
+    body = response.content
+    etag = response.get('ETag', '')
+    if response.status_code != 200 or not etag.startswith('"'):
+        return compress(body, level)
+
+    key = cache_key(request, coding, etag)
+    entry = local_cache.get(key)
+    if entry is None:
+        entry = cache.get(key)
+        if entry is not None:
+            local_cache.set(key, entry)
+    # The length guards against a view that reuses an ETag for other bytes.
+    if entry is not None and entry[0] == len(body):
+        return entry[1]
+    entry = (len(body), compress(body, level))
+    cache.set(key, entry, settings.COMPRESSION_CACHE_TIMEOUT)
+    local_cache.set(key, entry)
+    return entry[1]
+
+
+class CompressionMiddleware:
+    """Compress JSON and text responses with brotli, zstd or gzip."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        coding = choose_coding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding is None:
+            return response
+
+        compressed = compress_body(request, response, coding)
+        if len(compressed) >= len(response.content):
+            return response
+        # MetricsMiddleware reports the payload size as well as the bytes sent.
+        response.uncompressed_length = len(response.content)
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = coding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            # Like GZipMiddleware: the encoded bytes differ, and If-None-Match
+            # compares weakly, so revalidation still answers 304.
+            response.headers['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,156 @@
+"""
+Background generation of image derivatives after upload.
+
+Uploads are rendered by memories.imaging in a bounded process pool so the
+request thread only records a pending MediaAsset.  When a job finishes, the
+asset's variant list is stored and the memories collection is marked changed,
+because serialized memories embed their variant URLs.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+
+from . import imaging
+from .manifest import schedule_build
+from .models import MediaAsset
+from .versioning import MEMORIES, bump_version
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = 'derivatives'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the shared derivative pool, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.MEDIA_DERIVATIVE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+    return _executor
+
+
+def _discard_executor():
+    """Drop a broken pool so the next upload starts a fresh one."""
+    global _executor
+    with _executor_lock:
+        _executor = None
+
+
+def is_image(name):
+    return name.rsplit('.', 1)[-1].lower() in settings.ALLOWED_IMAGE_EXTENSIONS
+
+
+def derivative_dir(name):
+    """Storage directory holding the derivatives of the original `name`."""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'{DERIVATIVES_DIR}/{stem}'
+
+
+def stored_variants(name, variants):
+    """Replace render_derivatives' bare filenames with storage names."""
+    directory = derivative_dir(name)
+    for variant in variants:
+        variant['name'] = f"{directory}/{variant.pop('filename')}"
+    return variants
+
+
+def schedule_derivatives(name, wait=False):
+    """
+    Queue derivative rendering for an uploaded image.
+
+    Returns the pending MediaAsset, or None when the file is not an image or
+    the storage has no local filesystem path for the pool to work on.
+    """
+    if not is_image(name):
+        return None
+    try:
+        source = default_storage.path(name)
+        output_dir = default_storage.path(derivative_dir(name))
+    except NotImplementedError:
+        logger.warning("Storage has no local paths; skipping derivatives for %s", name)
+        return None
+
+    asset, _ = MediaAsset.objects.update_or_create(
+        name=name, defaults={'status': 'PENDING', 'variants': []}
+    )
+    formats = ('webp', 'avif') if imaging.avif_supported() else ('webp',)
+    future = get_executor().submit(imaging.render_derivatives, source, output_dir, formats)
+    if wait:
+        _record_result(name, future)
+    else:
+        future.add_done_callback(lambda done: _record_result(name, done))
+    return asset
+
+
+def _record_result(name, future):
+    close_old_connections()
+    try:
+        width, height, variants = future.result()
+    except BrokenProcessPool:
+        logger.exception("Derivative pool died while rendering %s", name)
+        _discard_executor()
+        MediaAsset.objects.filter(name=name).update(status='FAILED')
+        close_old_connections()
+        return
+    except Exception:
+        logger.exception("Derivative rendering failed for %s", name)
+        MediaAsset.objects.filter(name=name).update(status='FAILED')
+        close_old_connections()
+        return
+
+    MediaAsset.objects.filter(name=name).update(
+        status='READY', width=width, height=height, variants=stored_variants(name, variants)
+    )
+    bump_version(MEMORIES)
+    schedule_build()
+    close_old_connections()
+
+
+def storage_name_for_url(url):
+    """Map a media URL (absolute or relative) back to its storage name."""
+    if not url:
+        return None
+    path = urlparse(url).path
+    if not path.startswith(settings.MEDIA_URL):
+        return None
+    return path[len(settings.MEDIA_URL):]
+
+
+def variants_for_urls(urls):
+    """Map each media URL with ready derivatives to its list of variant URLs."""
+    names = {}
+    for url in urls:
+        name = storage_name_for_url(url)
+        if name:
+            names[name] = url
+    if not names:
+        return {}
+
+    result = {}
+    ready = MediaAsset.objects.filter(name__in=names, status='READY').values_list('name', 'variants')
+    for name, variants in ready:
+        result[names[name]] = [
+            {
+                'kind': variant['kind'],
+                'width': variant['width'],
+                'height': variant['height'],
+                'format': variant['format'],
+                'url': default_storage.url(variant['name']),
+            }
+            for variant in variants
+        ]
+    return result
@@ -0,0 +1,387 @@
+"""
+Server-push change stream over Server-Sent Events and WebSocket.
+
+Model signals, and the bulk paths that send none, publish events once the
+writing transaction commits.  The configured backend carries each event to
+the Hub of every worker process, which renders it once and copies it into
+the queue of each open connection on that worker.  A connection is just a
+coroutine waiting on its queue, so idle clients cost a few kilobytes and no
+thread.  That needs the ASGI server (see romantic_gallery/asgi.py); under
+WSGI the stream answers 501 and clients keep polling.
+
+Events are notifications, not a replayable log.  A client that connects,
+reconnects, or is dropped for falling behind (a `resync` event) catches up
+through delta sync (/api/memories/changes/) and then follows the stream.
+
+Backends, chosen with EVENTS_BACKEND:
+
+    LocalBackend        delivers inside the publishing process only; enough
+                        for a single ASGI worker.
+    UnixSocketBackend   each worker binds a datagram socket in
+                        EVENTS_SOCKET_DIR and publishers send every event to
+                        all of them, so the workers on one host share events
+                        without a broker.  A broker-backed backend (Redis
+                        pub/sub, PostgreSQL NOTIFY) implements the same
+                        start() and publish().
+"""
+import asyncio
+import atexit
+import json
+import os
+import socket
+import threading
+import uuid
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.contrib.auth.models import AnonymousUser
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.http import HttpRequest, JsonResponse
+from django.http.cookie import parse_cookie
+from django.utils.module_loading import import_string
+from django.views.decorators.http import require_GET
+
+from .transactions import on_commit_once
+
+STREAM_PATH = '/api/events/'
+
+
+def render(event, include_secret):
+    """
+    The (event name, JSON text) a subscriber receives, or None.
+
+    Clients without access to secret memories never see one being created,
+    and see any other change to one as a deletion, since they may hold it
+    from before it was hidden.
+    """
+    if event.get('secret') and not include_secret:
+        if event['action'] == 'created':
+            return None
+        event = {'type': event['type'], 'action': 'deleted', 'id': event['id']}
+    visible = {key: value for key, value in event.items() if key != 'secret'}
+    return event['type'], json.dumps(visible, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+# Queue markers besides (event name, JSON text) messages.
+PING = 'ping'
+RESYNC = 'resync'
+CLOSED = 'closed'
+
+
+class Subscriber:
+    """One open connection's queue of rendered events."""
+
+    def __init__(self, include_secret):
+        self.include_secret = include_secret
+        self.queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def offer(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A client this far behind must resync anyway.
+            self.end(RESYNC)
+
+    def end(self, marker):
+        """Drop what is queued and end the stream with `marker`."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(marker)
+
+
+class Hub:
+    """This worker's subscribers and the backend that feeds them."""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.loop = None
+        self.backend = None
+        self.heartbeat = None
+        self.lock = threading.Lock()
+
+    def get_backend(self):
+        with self.lock:
+            if self.backend is None:
+                self.backend = import_string(settings.EVENTS_BACKEND)(self)
+            return self.backend
+
+    def publish(self, event):
+        """Send an event to the subscribers of every worker; any thread."""
+        self.get_backend().publish(event)
+
+    def receive(self, event):
+        """Hand an event to this worker's event loop; any thread."""
+        loop = self.loop
+        if loop is None or not self.subscribers:
+            return
+        try:
+            loop.call_soon_threadsafe(self.deliver, event)
+        except RuntimeError:
+            # The loop has closed.
+            pass
+
+    def deliver(self, event):
+        """Queue an event for every subscriber; runs in the event loop."""
+        rendered = {}
+        for subscriber in list(self.subscribers):
+            scope = subscriber.include_secret
+            if scope not in rendered:
+                rendered[scope] = render(event, scope)
+            if rendered[scope] is not None:
+                subscriber.offer(rendered[scope])
+
+    async def ping(self):
+        # One timer for the whole worker rather than one per connection.
+        while True:
+            await asyncio.sleep(settings.EVENTS_HEARTBEAT)
+            for subscriber in list(self.subscribers):
+                subscriber.offer(PING)
+
+    async def subscribe(self, include_secret):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            await self.get_backend().start(loop)
+            self.heartbeat = loop.create_task(self.ping())
+        subscriber = Subscriber(include_secret)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+
+class LocalBackend:
+    """Deliver events within this process only."""
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    async def start(self, loop):
+        pass
+
+    def publish(self, event):
+        self.hub.receive(event)
+
+
+class _DatagramReceiver(asyncio.DatagramProtocol):
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def datagram_received(self, data, addr):
+        try:
+            event = json.loads(data)
+        except ValueError:
+            return
+        self.hub.deliver(event)
+
+
+class UnixSocketBackend:
+    """Share events between the workers on one host through datagram sockets."""
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.directory = settings.EVENTS_SOCKET_DIR
+        self.path = None
+        self.transport = None
+        # Never block a writing request on a slow worker: if its socket
+        # buffer is full the event is dropped for that worker.
+        self.sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sender.setblocking(False)
+        atexit.register(self.stop)
+
+    async def start(self, loop):
+        self.stop()
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.sock')
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: _DatagramReceiver(self.hub), local_addr=self.path, family=socket.AF_UNIX
+        )
+
+    def stop(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+    def publish(self, event):
+        data = json.dumps(event, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8')
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith('.sock')]
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                self.sender.sendto(data, path)
+            except ConnectionRefusedError:
+                # Left behind by a worker that died without cleaning up.
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            except OSError:
+                # Full buffer, or the worker exited since listdir().
+                pass
+
+
+hub = Hub()
+
+
+def publish(event):
+    """Publish an event to every stream once the current transaction commits."""
+    transaction.on_commit(lambda: hub.publish(event))
+
+
+def _publish_memories_changed():
+    hub.publish({'type': 'memories', 'action': 'changed'})
+
+
+def publish_memories_changed():
+    """
+    Tell every stream that many memories changed at once, so clients delta
+    sync instead of receiving one event per row.  Sent once per transaction.
+    """
+    on_commit_once(_publish_memories_changed)
+
+
+async def follow(scope, receive, disconnect_type):
+    """
+    Messages for a new connection until its client disconnects (receive()
+    yields `disconnect_type`) or falls behind, which ends with RESYNC.
+    """
+    user = await sync_to_async(handshake_user)(scope)
+    subscriber = await hub.subscribe(user.is_authenticated)
+
+    async def watch():
+        while (await receive())['type'] != disconnect_type:
+            pass
+        subscriber.end(CLOSED)
+
+    watcher = asyncio.ensure_future(watch())
+    try:
+        while True:
+            message = await subscriber.queue.get()
+            if message is CLOSED:
+                return
+            yield message
+            if message is RESYNC:
+                return
+    finally:
+        watcher.cancel()
+        hub.unsubscribe(subscriber)
+
+
+def handshake_user(scope):
+    """
+    The session user of a stream request.  Browsers send cookies with
+    cross-site WebSocket and EventSource requests too, so other origins
+    stay anonymous.
+    """
+    headers = {
+        name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']
+    }
+    origin = headers.get('origin')
+    if origin and origin not in settings.CORS_ALLOWED_ORIGINS:
+        if urlsplit(origin).netloc != headers.get('host'):
+            return AnonymousUser()
+    # Runs outside Django's request cycle, so manage connections as it would.
+    close_old_connections()
+    try:
+        cookies = parse_cookie(headers.get('cookie', ''))
+        engine = import_module(settings.SESSION_ENGINE)
+        request = HttpRequest()
+        request.session = engine.SessionStore(cookies.get(settings.SESSION_COOKIE_NAME))
+        return get_user(request)
+    finally:
+        close_old_connections()
+
+
+async def sse_events(scope, receive, send):
+    """The change stream as Server-Sent Events."""
+    if scope['method'] != 'GET':
+        await send({
+            'type': 'http.response.start', 'status': 405, 'headers': [(b'allow', b'GET')]
+        })
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    headers = [
+        (b'content-type', b'text/event-stream'),
+        (b'cache-control', b'no-cache'),
+        # Ask nginx to pass each event on instead of buffering the response.
+        (b'x-accel-buffering', b'no'),
+    ]
+    origin = dict(scope['headers']).get(b'origin')
+    if origin and origin.decode('latin-1') in settings.CORS_ALLOWED_ORIGINS:
+        headers += [
+            (b'access-control-allow-origin', origin),
+            (b'access-control-allow-credentials', b'true'),
+            (b'vary', b'Origin'),
+        ]
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+    await send({
+        'type': 'http.response.body', 'body': b'retry: 3000\n: connected\n\n', 'more_body': True
+    })
+    async for message in follow(scope, receive, 'http.disconnect'):
+        if message is PING:
+            # Keeps proxies from closing an idle stream.
+            frame = b': ping\n\n'
+        elif message is RESYNC:
+            frame = b'event: resync\ndata: {}\n\n'
+        else:
+            name, data = message
+            frame = f'event: {name}\ndata: {data}\n\n'.encode('utf-8')
+        await send({'type': 'http.response.body', 'body': frame, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def websocket_events(scope, receive, send):
+    """
+    The change stream over WebSocket, as {"event": name, "data": {...}} text
+    frames.
+    """
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    if scope['path'] != STREAM_PATH:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+    await send({'type': 'websocket.accept'})
+    async for message in follow(scope, receive, 'websocket.disconnect'):
+        if message is PING:
+            continue
+        if message is RESYNC:
+            await send({'type': 'websocket.close', 'code': 4000, 'reason': 'resync'})
+            return
+        name, data = message
+        await send({'type': 'websocket.send', 'text': f'{{"event":"{name}","data":{data}}}'})
+
+
+async def application(scope, receive, send):
+    """
+    ASGI app for the change stream: SSE at STREAM_PATH and every WebSocket.
+    romantic_gallery.asgi routes these here, ahead of Django, so an idle
+    stream holds no request context and no thread.
+    """
+    if scope['type'] == 'websocket':
+        await websocket_events(scope, receive, send)
+    else:
+        await sse_events(scope, receive, send)
+
+
+@require_GET
+def event_stream(request):
+    """Only reached without the ASGI app, which serves /api/events/ itself."""
+    return JsonResponse({
+        'success': False,
+        'error': 'The change stream needs the ASGI server; poll /api/memories/changes/'
+    }, status=501)
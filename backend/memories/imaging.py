@@ -0,0 +1,159 @@
+"""
+Pillow rendering of image derivatives.
+
+This module must stay free of Django imports: it is the entry point for the
+derivative process pool, whose workers are spawned without a configured
+project.
+"""
+import hashlib
+import math
+import os
+from datetime import datetime
+
+from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError
+
+# Power-of-two GPU textures, the smallest doubling as far-LOD thumbnails.
+TEXTURE_SIZES = (64, 128, 256, 512, 1024, 2048)
+
+# Aspect-preserving widths for the 2D gallery and modal.
+RESPONSIVE_WIDTHS = (320, 640, 1280, 1920)
+
+# EXIF orientations that rotate the stored image by 90 degrees.
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+EXIF_DATE_FORMAT = '%Y:%m:%d %H:%M:%S'
+
+WEBP_QUALITY = 80
+AVIF_QUALITY = 60
+
+
+def avif_supported():
+    """Whether this Pillow build can encode AVIF."""
+    try:
+        from PIL import features
+        return bool(features.check('avif'))
+    except (ImportError, ValueError):
+        return False
+
+
+def probe_file(path, block_size=1024 * 1024):
+    """
+    Hash a media file and read what the importer needs from its headers.
+
+    Returns a dict with path, sha256, size, and for images the displayed
+    width and height and the EXIF capture time (a naive datetime, or None).
+    Only the image header is decoded, not the pixels.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(block_size), b''):
+            digest.update(block)
+    info = {
+        'path': path,
+        'sha256': digest.hexdigest(),
+        'size': os.path.getsize(path),
+        'width': None,
+        'height': None,
+        'taken_at': None,
+    }
+    try:
+        with Image.open(path) as image:
+            exif = image.getexif()
+            width, height = image.size
+    except (UnidentifiedImageError, OSError):
+        return info
+
+    if exif.get(ExifTags.Base.Orientation) in TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    info['width'], info['height'] = width, height
+    stamp = (
+        exif.get_ifd(ExifTags.IFD.Exif).get(ExifTags.Base.DateTimeOriginal)
+        or exif.get(ExifTags.Base.DateTime)
+    )
+    if isinstance(stamp, str):
+        try:
+            info['taken_at'] = datetime.strptime(stamp.strip('\x00 '), EXIF_DATE_FORMAT)
+        except ValueError:
+            pass
+    return info
+
+
+def _nearest_power_of_two(value):
+    return 1 << max(0, round(math.log2(max(value, 1))))
+
+
+def _floor_power_of_two(value):
+    return 1 << max(0, int(value).bit_length() - 1)
+
+
+def texture_dimensions(width, height, size):
+    """
+    Power-of-two dimensions with the longer side `size` and the aspect kept as
+    near as possible, never taller or wider than the source.
+    """
+    if width >= height:
+        return size, min(size, _nearest_power_of_two(size * height / width), _floor_power_of_two(height))
+    return min(size, _nearest_power_of_two(size * width / height), _floor_power_of_two(width)), size
+
+
+def _prepare(image):
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def _save(image, output_dir, filename, image_format):
+    path = os.path.join(output_dir, filename)
+    if image_format == 'avif':
+        image.save(path, 'AVIF', quality=AVIF_QUALITY)
+    else:
+        image.save(path, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return os.path.getsize(path)
+
+
+def render_derivatives(source_path, output_dir, formats=('webp',)):
+    """
+    Render the texture and responsive ladders for one image.
+
+    Returns (width, height, variants) where each variant is a dict with kind,
+    width, height, format, size in bytes and the filename inside output_dir.
+    Sizes above the original are skipped, so nothing is upscaled; a source
+    smaller than the smallest texture gets one at its own largest power of two.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with Image.open(source_path) as original:
+        image = _prepare(original)
+    width, height = image.size
+    longest = max(width, height)
+    variants = []
+
+    largest = _floor_power_of_two(longest)
+    for size in [size for size in TEXTURE_SIZES if size <= largest] or [largest]:
+        dimensions = texture_dimensions(width, height, size)
+        resized = image.resize(dimensions, Image.Resampling.LANCZOS)
+        filename = f'texture-{size}.webp'
+        variants.append({
+            'kind': 'texture',
+            'width': dimensions[0],
+            'height': dimensions[1],
+            'format': 'webp',
+            'bytes': _save(resized, output_dir, filename, 'webp'),
+            'filename': filename,
+        })
+
+    for target in RESPONSIVE_WIDTHS:
+        if target >= width:
+            break
+        dimensions = (target, max(1, round(height * target / width)))
+        resized = image.resize(dimensions, Image.Resampling.LANCZOS)
+        for image_format in formats:
+            filename = f'w{target}.{image_format}'
+            variants.append({
+                'kind': 'responsive',
+                'width': dimensions[0],
+                'height': dimensions[1],
+                'format': image_format,
+                'bytes': _save(resized, output_dir, filename, image_format),
+                'filename': filename,
+            })
+
+    return width, height, variants
\ No newline at end of file
@@ -0,0 +1,184 @@
+"""
+Even placement of memories on the unit sphere.
+
+Bulk layout uses a Fibonacci (golden-angle) lattice, which spaces N points
+almost uniformly in a single vectorised pass.  New memories are placed by
+best-candidate sampling: a batch of random directions is scored against the
+neighbours fetched through the spatial_cell index, and the one farthest from
+its nearest neighbour wins.
+"""
+import math
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Memory
+from .spatial import cells_for_points, cover_cone, merge_ranges
+from .versioning import MEMORIES, bump_version
+
+GOLDEN_ANGLE = math.pi * (3.0 - math.sqrt(5.0))
+
+LAYOUT_FIELDS = ['position_x', 'position_y', 'position_z', 'spatial_cell', 'updated_at']
+
+
+def fibonacci_sphere(n):
+    """Return an (n, 3) array of unit vectors spread along a golden-angle spiral."""
+    k = np.arange(n, dtype=np.float64) + 0.5
+    z = 1.0 - 2.0 * k / max(n, 1)
+    r = np.sqrt(np.clip(1.0 - z * z, 0.0, None))
+    theta = GOLDEN_ANGLE * k
+    return np.column_stack((r * np.cos(theta), r * np.sin(theta), z))
+
+
+def random_unit_vectors(count, rng=None):
+    """Return a (count, 3) array of uniformly random unit vectors."""
+    rng = rng or np.random.default_rng()
+    vectors = rng.standard_normal((count, 3))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def mean_spacing(n):
+    """Typical angular distance between neighbours when n points tile the sphere."""
+    return math.sqrt(4.0 * math.pi / max(n, 1))
+
+
+def unit_rows(points):
+    """Normalise an (N, 3) array of positions, leaving zero vectors at zero."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    norms = np.linalg.norm(points, axis=1, keepdims=True)
+    return points / np.where(norms == 0, 1.0, norms)
+
+
+def farthest_candidate(candidates, neighbours):
+    """Return the candidate farthest from its nearest unit-vector neighbour."""
+    if len(neighbours) == 0:
+        return candidates[0]
+    closest = (candidates @ neighbours.T).max(axis=1)
+    return candidates[int(np.argmin(closest))]
+
+
+def best_candidate(candidates, neighbours):
+    """Return the candidate whose nearest neighbour is farthest away."""
+    return farthest_candidate(candidates, unit_rows(neighbours))
+
+
+def free_position(candidate_count=16, rng=None):
+    """Pick a position for a new memory that keeps clear of existing ones."""
+    candidates = random_unit_vectors(candidate_count, rng)
+    existing = Memory.objects.count()
+    if existing == 0:
+        return tuple(float(c) for c in candidates[0])
+
+    radius = min(math.pi, 2.0 * mean_spacing(existing + 1))
+    ranges = merge_ranges(
+        cell_range for candidate in candidates for cell_range in cover_cone(candidate, radius)
+    )
+    cover = Q()
+    for low, high in ranges:
+        cover |= Q(spatial_cell__range=(low, high))
+    neighbours = list(
+        Memory.objects.filter(cover).values_list('position_x', 'position_y', 'position_z')
+    )
+    return tuple(float(c) for c in best_candidate(candidates, neighbours))
+
+
+def free_positions(count, candidate_count=16, rng=None):
+    """
+    Pick positions for `count` new memories created together.
+
+    Each one keeps clear of the existing memories and of those placed before
+    it in the batch.  Existing positions are read once into an array with
+    room for the batch, and every placement is written into it in place, so
+    scoring a memory's candidates is one matrix product over the rows filled
+    so far.  Up to around a million memories that beats the cell-cover query
+    free_position makes, whose cover alone takes tens of milliseconds.
+    """
+    if count <= 0:
+        return []
+    rng = rng or np.random.default_rng()
+    existing = unit_rows(list(Memory.objects.values_list('position_x', 'position_y', 'position_z')))
+    points = np.empty((len(existing) + count, 3))
+    points[:len(existing)] = existing
+    filled = len(existing)
+    for _ in range(count):
+        candidates = random_unit_vectors(candidate_count, rng)
+        points[filled] = farthest_candidate(candidates, points[:filled])
+        filled += 1
+    return [tuple(point) for point in points[len(existing):].tolist()]
+
+
+def relayout(queryset=None, batch_size=2000, progress=None):
+    """
+    Re-place every memory in `queryset` on a Fibonacci lattice.
+
+    Memories are laid along the spiral in display order, positions and cells
+    are computed for the whole set at once, and rows are written back with
+    chunked bulk_update inside one transaction.  Returns the number placed.
+    """
+    # Imported here: signals -> serializers -> layout would otherwise be circular.
+    from .signals import memories_changed_in_bulk
+
+    if queryset is None:
+        queryset = Memory.objects.all()
+    ids = list(queryset.order_by('order', 'date', 'id').values_list('id', flat=True))
+    points = fibonacci_sphere(len(ids))
+    cells = cells_for_points(points)
+    now = timezone.now()
+
+    with transaction.atomic():
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            batch = [
+                Memory(
+                    id=pk, position_x=x, position_y=y, position_z=z,
+                    spatial_cell=cell, updated_at=now
+                )
+                for pk, (x, y, z), cell in zip(
+                    ids[start:end], points[start:end].tolist(), cells[start:end].tolist()
+                )
+            ]
+            Memory.objects.bulk_update(batch, LAYOUT_FIELDS, batch_size=batch_size)
+            if progress:
+                progress(min(end, len(ids)), len(ids))
+        memories_changed_in_bulk()
+
+    return len(ids)
+
+
+def backfill_cells(batch_size=2000, progress=None):
+    """
+    Recompute spatial_cell from the stored positions of every memory.
+
+    Rows saved before the column existed hold cell 0, which hides them from
+    viewport queries.  Positions are read one primary-key page at a time and
+    only rows whose cell is wrong are written, so it is cheap to rerun and
+    leaves positions and updated_at alone.  Returns the number fixed.
+    """
+    fixed = seen = 0
+    total = Memory.objects.count()
+    rows = Memory.objects.order_by('pk').values_list(
+        'pk', 'position_x', 'position_y', 'position_z', 'spatial_cell'
+    )
+    last = None
+    while True:
+        page = list((rows if last is None else rows.filter(pk__gt=last))[:batch_size])
+        if not page:
+            break
+        last = page[-1][0]
+        seen += len(page)
+        cells = cells_for_points([row[1:4] for row in page]).tolist()
+        stale = [
+            Memory(pk=row[0], spatial_cell=cell)
+            for row, cell in zip(page, cells) if row[4] != cell
+        ]
+        if stale:
+            Memory.objects.bulk_update(stale, ['spatial_cell'], batch_size=batch_size)
+            fixed += len(stale)
+        if progress:
+            progress(seen, total)
+    if fixed:
+        # Viewport responses are cached under the collection version.
+        bump_version(MEMORIES)
+    return fixed
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from memories.layout import backfill_cells
+
+
+class Command(BaseCommand):
+    """Fill in spatial_cell for memories stored before it existed, keeping positions."""
+
+    help = 'Recompute every memory\'s spatial cell from its position'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Rows read and written per batch'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(done, total):
+            self.stdout.write(f'  {done}/{total} memories checked')
+
+        fixed = backfill_cells(batch_size=options['batch_size'], progress=progress)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated the spatial cell of {fixed} memories in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,430 @@
+import copy
+import http.client
+import json
+import math
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer
+from django.db import connection
+from django.test import Client
+from django.test.testcases import LiveServerThread
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from django.utils import timezone
+
+from memories.layout import fibonacci_sphere
+from memories.models import Memory
+from memories.spatial import cells_for_points
+from memories.versioning import MEMORIES, bump_version
+
+ADMIN_USERNAME = 'bench-admin'
+ADMIN_PASSWORD = 'bench-password-1'
+UPLOAD_SIZE = 64 * 1024
+
+# name, method, path, expected status
+ENDPOINTS = [
+    ('memory-list', 'GET', '/api/memories/', 200),
+    ('memory-featured', 'GET', '/api/memories/featured/', 200),
+    ('memory-category', 'GET', '/api/memories/category/?type=VIDEO', 200),
+    ('site-settings', 'GET', '/api/settings/', 200),
+    ('file-upload', 'POST', '/api/memories/upload/', 201),
+    ('admin-login', 'POST', '/api/auth/login/', 200),
+]
+
+# A bucket no benchmark can empty.
+UNTHROTTLED = ('1000000/s', 1_000_000)
+
+
+def isolated_settings(scratch):
+    """
+    Settings that keep a run away from real media, caches and manifests, and
+    that lift the throttle, so every request is answered rather than 429.
+    """
+    caches = copy.deepcopy(settings.CACHES)
+    prefix = f'bench-{uuid.uuid4().hex[:8]}'
+    for alias in caches.values():
+        alias['KEY_PREFIX'] = prefix
+    return override_settings(
+        DEBUG=False,
+        ALLOWED_HOSTS=['testserver', 'localhost', '127.0.0.1'],
+        MEDIA_ROOT=os.path.join(scratch, 'media'),
+        UNIVERSE_MANIFEST_ROOT=os.path.join(scratch, 'manifest'),
+        METRICS_DIR=os.path.join(scratch, 'metrics'),
+        CACHES=caches,
+        THROTTLE_BUCKETS={scope: UNTHROTTLED for scope in settings.THROTTLE_BUCKETS},
+    )
+
+
+def create_test_database(scratch):
+    """Create the test database on disk, so server threads get their own connections."""
+    for name, alias in settings.DATABASES.items():
+        test = alias.setdefault('TEST', {})
+        if alias['ENGINE'].endswith('sqlite3') and not test.get('NAME'):
+            # The default in-memory test database cannot be shared between threads.
+            test['NAME'] = os.path.join(scratch, f'bench-{name}.sqlite3')
+    return setup_databases(verbosity=0, interactive=False)
+
+
+def seed_memories(count, batch_size=5000):
+    """Synthetic memories: 5% secret, ~2% featured, 70/20/10 photo/video/audio."""
+    points = fibonacci_sphere(count)
+    cells = cells_for_points(points).tolist()
+    base = timezone.now()
+    for start in range(0, count, batch_size):
+        batch = []
+        for i in range(start, min(start + batch_size, count)):
+            bucket = i % 10
+            batch.append(Memory(
+                title=f'Benchmark memory {i}',
+                caption=None if i % 3 else f'Caption for synthetic memory {i}',
+                media_url=f'https://example.com/media/{i}.jpg',
+                position_x=points[i][0], position_y=points[i][1], position_z=points[i][2],
+                spatial_cell=cells[i],
+                is_secret=i % 20 == 0,
+                is_featured=i % 50 == 1,
+                category='PHOTO' if bucket < 7 else 'VIDEO' if bucket < 9 else 'AUDIO',
+                date=base - timedelta(minutes=i),
+                order=i % 100,
+            ))
+        Memory.objects.bulk_create(batch)
+    bump_version(MEMORIES)
+    User.objects.create_user(ADMIN_USERNAME, password=ADMIN_PASSWORD, is_staff=True)
+
+
+class NoDelayWSGIServer(ThreadedWSGIServer):
+    """Threaded dev server that disables Nagle's algorithm on each connection."""
+
+    def get_request(self):
+        # The handler writes headers and body separately; with Nagle on, the
+        # client's delayed ACK adds ~40ms to every keep-alive response.
+        request, address = super().get_request()
+        request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return request, address
+
+
+class BenchServerThread(LiveServerThread):
+    server_class = NoDelayWSGIServer
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(latencies, elapsed):
+    ordered = sorted(latencies)
+    return {
+        'throughput_rps': round(len(ordered) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': round(sum(ordered) / len(ordered) * 1000, 3) if ordered else None,
+            'p50': round(percentile(ordered, 0.50) * 1000, 3) if ordered else None,
+            'p95': round(percentile(ordered, 0.95) * 1000, 3) if ordered else None,
+            'p99': round(percentile(ordered, 0.99) * 1000, 3) if ordered else None,
+            'max': round(ordered[-1] * 1000, 3) if ordered else None,
+        },
+    }
+
+
+class Command(BaseCommand):
+    """
+    Load and latency benchmark for the public and admin API.
+
+    A throwaway test database is seeded with synthetic memories, and each
+    endpoint is driven through the Django test client (in-process, no
+    network) and/or a real threaded HTTP server on localhost.  Results are
+    written as JSON keyed by dataset size, mode and endpoint; --compare
+    reports the change against an earlier run.
+    """
+
+    help = 'Benchmark API throughput and p50/p95/p99 latency on synthetic datasets'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[1_000],
+            help='Dataset sizes to seed, e.g. 1000 100000 1000000'
+        )
+        parser.add_argument(
+            '--mode',
+            choices=['client', 'server', 'both'],
+            default='both',
+            help='Drive the API through the test client, a live HTTP server, or both'
+        )
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=20, help='Untimed requests per endpoint')
+        parser.add_argument(
+            '--login-requests',
+            type=int,
+            default=20,
+            help='Timed requests for admin-login, which is dominated by password hashing'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='Parallel connections in server mode'
+        )
+        parser.add_argument(
+            '--endpoints',
+            nargs='+',
+            choices=[name for name, _, _, _ in ENDPOINTS],
+            help='Only benchmark these endpoints'
+        )
+        parser.add_argument('--output', help='Write the JSON report here ("-" for stdout)')
+        parser.add_argument('--compare', help='Earlier JSON report to compare against')
+        parser.add_argument(
+            '--max-regression',
+            type=float,
+            help='Fail if any p95 grows or throughput drops by more than this percentage'
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.endpoints = [
+            endpoint for endpoint in ENDPOINTS
+            if not options['endpoints'] or endpoint[0] in options['endpoints']
+        ]
+        modes = ['client', 'server'] if options['mode'] == 'both' else [options['mode']]
+        scratch = tempfile.mkdtemp(prefix='bench-api-')
+        # Keep stdout pure JSON when the report goes there.
+        self.progress = self.stderr.write if options['output'] == '-' else self.stdout.write
+
+        report = {'meta': self.meta(), 'results': []}
+        try:
+            with isolated_settings(scratch):
+                for rows in sorted(options['rows']):
+                    self.progress(f'Creating benchmark database for {rows:,} memories...')
+                    old_config = create_test_database(scratch)
+                    try:
+                        started = time.perf_counter()
+                        seed_memories(rows)
+                        self.progress(f'  seeded in {time.perf_counter() - started:.1f}s')
+                        for mode in modes:
+                            for result in self.run(mode, rows):
+                                report['results'].append(result)
+                                self.print_result(result)
+                    finally:
+                        teardown_databases(old_config, verbosity=0)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+        elif options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+        if options['compare']:
+            self.compare(report, options['compare'], options['max_regression'])
+
+    def meta(self):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                cwd=settings.BASE_DIR, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'timestamp': timezone.now().isoformat(),
+            'commit': commit,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'cpu_count': os.cpu_count(),
+            'requests': self.options['requests'],
+            'concurrency': self.options['concurrency'],
+        }
+
+    def request_count(self, name):
+        if name == 'admin-login':
+            return self.options['login_requests']
+        return self.options['requests']
+
+    def run(self, mode, rows):
+        runner = self.client_requests if mode == 'client' else self.server_requests
+        server = None
+        if mode == 'server':
+            server = BenchServerThread('localhost', lambda handler: handler)
+            server.daemon = True
+            server.start()
+            server.is_ready.wait()
+            if server.error:
+                raise CommandError(f'Could not start the live server: {server.error}')
+        try:
+            for name, method, path, expected in self.endpoints:
+                count = self.request_count(name)
+                warmup = min(self.options['warmup'], count)
+                runner(server, name, method, path, expected, warmup)
+                latencies, errors, elapsed = runner(server, name, method, path, expected, count)
+                result = {
+                    'rows': rows,
+                    'mode': mode,
+                    'endpoint': name,
+                    'method': method,
+                    'path': path,
+                    'requests': count,
+                    'concurrency': self.options['concurrency'] if mode == 'server' else 1,
+                    'errors': errors,
+                }
+                result.update(summarize(latencies, elapsed))
+                yield result
+        finally:
+            if server is not None:
+                server.terminate()
+                server.join()
+
+    def client_requests(self, server, name, method, path, expected, count):
+        """Sequential requests through the in-process test client."""
+        client = Client()
+        if name == 'file-upload':
+            client.login(username=ADMIN_USERNAME, password=ADMIN_PASSWORD)
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for _ in range(count):
+            begin = time.perf_counter()
+            if name == 'file-upload':
+                upload = SimpleUploadedFile(
+                    f'{uuid.uuid4().hex}.mp3', os.urandom(UPLOAD_SIZE), 'audio/mpeg'
+                )
+                response = client.post(path, {'file': upload})
+            elif name == 'admin-login':
+                response = client.post(
+                    path, {'username': ADMIN_USERNAME, 'password': ADMIN_PASSWORD},
+                    content_type='application/json'
+                )
+            else:
+                response = client.get(path)
+            latencies.append(time.perf_counter() - begin)
+            errors += response.status_code != expected
+        return latencies, errors, time.perf_counter() - started
+
+    def server_requests(self, server, name, method, path, expected, count):
+        """Requests over keep-alive HTTP connections from --concurrency threads."""
+        cookie, csrf = self.server_login(server) if name == 'file-upload' else (None, None)
+        remaining = iter(range(count))
+        lock = threading.Lock()
+        latencies, errors = [], [0]
+
+        def worker():
+            conn = http.client.HTTPConnection('localhost', server.port, timeout=60)
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        break
+                body, headers = self.request_body(name, cookie, csrf)
+                begin = time.perf_counter()
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                elapsed = time.perf_counter() - begin
+                with lock:
+                    latencies.append(elapsed)
+                    errors[0] += response.status != expected
+            conn.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.options['concurrency'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, errors[0], time.perf_counter() - started
+
+    def server_login(self, server):
+        """Log in over HTTP and return (Cookie header, CSRF token)."""
+        conn = http.client.HTTPConnection('localhost', server.port, timeout=60)
+        conn.request(
+            'POST', '/api/auth/login/',
+            body=json.dumps({'username': ADMIN_USERNAME, 'password': ADMIN_PASSWORD}),
+            headers={'Content-Type': 'application/json'}
+        )
+        response = conn.getresponse()
+        response.read()
+        conn.close()
+        cookies = {}
+        for header in response.headers.get_all('Set-Cookie') or []:
+            key, _, value = header.split(';', 1)[0].partition('=')
+            cookies[key.strip()] = value.strip()
+        if response.status != 200 or settings.SESSION_COOKIE_NAME not in cookies:
+            raise CommandError('Benchmark admin could not log in to the live server')
+        cookie = '; '.join(f'{key}={value}' for key, value in cookies.items())
+        return cookie, cookies.get(settings.CSRF_COOKIE_NAME)
+
+    def request_body(self, name, cookie, csrf):
+        if name == 'admin-login':
+            body = json.dumps({'username': ADMIN_USERNAME, 'password': ADMIN_PASSWORD})
+            return body, {'Content-Type': 'application/json'}
+        if name == 'file-upload':
+            boundary = uuid.uuid4().hex
+            body = (
+                f'--{boundary}\r\n'
+                f'Content-Disposition: form-data; name="file"; filename="{uuid.uuid4().hex}.mp3"\r\n'
+                f'Content-Type: audio/mpeg\r\n\r\n'
+            ).encode() + os.urandom(UPLOAD_SIZE) + f'\r\n--{boundary}--\r\n'.encode()
+            headers = {
+                'Content-Type': f'multipart/form-data; boundary={boundary}',
+                'Cookie': cookie,
+                'X-CSRFToken': csrf or '',
+            }
+            return body, headers
+        return None, {}
+
+    def print_result(self, result):
+        latency = result['latency_ms']
+        self.progress(
+            f"  {result['mode']:<6} {result['endpoint']:<16} "
+            f"{result['throughput_rps'] or 0:>9,.1f} req/s  "
+            f"p50 {latency['p50'] or 0:>8.2f}ms  p95 {latency['p95'] or 0:>8.2f}ms  "
+            f"p99 {latency['p99'] or 0:>8.2f}ms  errors {result['errors']}"
+        )
+
+    def compare(self, report, baseline_path, max_regression):
+        """Print p95 and throughput changes against a baseline report."""
+        with open(baseline_path) as handle:
+            baseline = json.load(handle)
+        previous = {
+            (result['rows'], result['mode'], result['endpoint']): result
+            for result in baseline['results']
+        }
+        regressions = []
+        self.progress(
+            f"Compared with {baseline_path} ({baseline['meta'].get('commit') or 'unknown commit'}):"
+        )
+        for result in report['results']:
+            key = (result['rows'], result['mode'], result['endpoint'])
+            before = previous.get(key)
+            if before is None or not before['latency_ms']['p95'] or not before['throughput_rps']:
+                continue
+            p95_change = (result['latency_ms']['p95'] / before['latency_ms']['p95'] - 1) * 100
+            rps_change = (result['throughput_rps'] / before['throughput_rps'] - 1) * 100
+            self.progress(
+                f'  {key[0]:>9,} {key[1]:<6} {key[2]:<16} '
+                f'p95 {p95_change:+7.1f}%  throughput {rps_change:+7.1f}%'
+            )
+            if max_regression is not None and (
+                p95_change > max_regression or -rps_change > max_regression
+            ):
+                regressions.append(key)
+        if regressions:
+            raise CommandError(
+                f'{len(regressions)} benchmark(s) regressed by more than {max_regression}%'
+            )
@@ -0,0 +1,136 @@
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, RequestFactory
+from django.test.utils import teardown_databases
+
+from memories.compression import (
+    CODINGS, cache_key, compress_brotli, compress_gzip, compress_zstd, local_cache
+)
+from memories.manifest import build_document
+
+from .bench_api import (
+    ADMIN_PASSWORD, ADMIN_USERNAME, create_test_database, isolated_settings, seed_memories
+)
+
+# name, path, staff
+BODIES = [
+    ('memory-list', '/api/memories/', False),
+    ('memory-list-far', '/api/memories/?lod=far', False),
+    ('memory-featured', '/api/memories/featured/', False),
+    ('memory-search', '/api/memories/search/?q=memory', False),
+    ('memory-changes', '/api/memories/changes/', False),
+    ('staff-memory-list', '/api/memories/', True),
+]
+
+COMPRESSORS = {
+    'gzip': (compress_gzip, [1, 6, 9]),
+    'br': (compress_brotli, [1, 4, 6, 11]),
+    'zstd': (compress_zstd, [1, 3, 9, 19]),
+}
+
+
+def timed(function, min_time):
+    """Mean seconds per call of function(), repeated for at least min_time."""
+    calls, started = 0, time.perf_counter()
+    while True:
+        result = function()
+        calls += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            return elapsed / calls, result
+
+
+class Command(BaseCommand):
+    """
+    CPU cost against bytes saved for response compression.
+
+    Seeds a throwaway database, renders representative API bodies plus the
+    universe manifest, and compresses each with every coding at several
+    levels.  It then times whole requests through CompressionMiddleware:
+    uncompressed, compressed on every request (cold cache), and served from
+    the compressed-body cache (hot), which is what a hot versioned page costs.
+    """
+
+    help = 'Benchmark compression levels and the compressed-body cache on API responses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5_000, help='Memories to seed')
+        parser.add_argument(
+            '--min-time', type=float, default=0.2, help='Seconds to time each measurement'
+        )
+
+    def handle(self, *args, **options):
+        scratch = tempfile.mkdtemp(prefix='bench-compression-')
+        try:
+            with isolated_settings(scratch):
+                old_config = create_test_database(scratch)
+                try:
+                    seed_memories(options['rows'])
+                    public, staff = Client(), Client()
+                    staff.login(username=ADMIN_USERNAME, password=ADMIN_PASSWORD)
+                    self.bench_codecs(public, staff, options['min_time'])
+                    self.bench_requests(public, staff, options['min_time'])
+                finally:
+                    teardown_databases(old_config, verbosity=0)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    def bench_codecs(self, public, staff, min_time):
+        bodies = [
+            (name, (staff if is_staff else public).get(path).content)
+            for name, path, is_staff in BODIES
+        ]
+        bodies.append(('universe-manifest', build_document()))
+
+        self.stdout.write(
+            f"{'body':<20} {'bytes':>9} {'coding':>6} {'level':>5} {'ms':>8} "
+            f"{'MB/s':>8} {'saved':>7} {'KB saved/ms':>12}"
+        )
+        for name, body in bodies:
+            for coding, (compress, levels) in COMPRESSORS.items():
+                if coding not in CODINGS:
+                    continue
+                for level in levels:
+                    seconds, compressed = timed(lambda: compress(body, level), min_time)
+                    saved = len(body) - len(compressed)
+                    self.stdout.write(
+                        f'{name:<20} {len(body):>9} {coding:>6} {level:>5} '
+                        f'{seconds * 1000:>8.3f} {len(body) / seconds / 1e6:>8.1f} '
+                        f'{saved / len(body):>7.1%} {saved / 1024 / (seconds * 1000):>12.1f}'
+                    )
+            self.stdout.write('')
+
+    def bench_requests(self, public, staff, min_time):
+        self.stdout.write(
+            f"{'request':<20} {'coding':>6} {'identity ms':>12} {'cold ms':>9} {'hot ms':>9} "
+            f"{'bytes':>9} {'sent':>8}"
+        )
+        for name, path, is_staff in BODIES:
+            client = staff if is_staff else public
+            identity, plain = timed(lambda: client.get(path), min_time)
+            request = RequestFactory().get(path)
+            request.user = User.objects.get(username=ADMIN_USERNAME) if is_staff else AnonymousUser()
+            for coding in CODINGS:
+                key = cache_key(request, coding, plain.get('ETag', ''))
+
+                def cold():
+                    cache.delete(key)
+                    with local_cache.lock:
+                        local_cache.discard(key)
+                    return client.get(path, HTTP_ACCEPT_ENCODING=coding)
+
+                cold_seconds, _ = timed(cold, min_time)
+                hot_seconds, response = timed(
+                    lambda: client.get(path, HTTP_ACCEPT_ENCODING=coding), min_time
+                )
+                self.stdout.write(
+                    f'{name:<20} {response.get("Content-Encoding", "-"):>6} '
+                    f'{identity * 1000:>12.2f} {cold_seconds * 1000:>9.2f} '
+                    f'{hot_seconds * 1000:>9.2f} {len(plain.content):>9} {len(response.content):>8}'
+                )
+        self.stdout.write('cold: compressed on every request; hot: served from the cache')
@@ -0,0 +1,173 @@
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from romantic_gallery.database import sqlite_init_command
+
+# Connection setup per mode: (journal pragmas, isolation_level, busy timeout).
+# 'default' is what Django does out of the box; 'tuned' is what
+# parse_database_url configures.
+MODES = {
+    'default': ('', 'DEFERRED', 5.0),
+    'tuned': (sqlite_init_command(256 * 1024 ** 2), 'IMMEDIATE', 20.0),
+}
+
+SCHEMA = """
+CREATE TABLE memory (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    caption TEXT NOT NULL,
+    is_featured INTEGER NOT NULL,
+    "order" INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX memory_featured ON memory (is_featured, "order");
+"""
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Worker(threading.Thread):
+    """Run one kind of operation in a loop until the deadline."""
+
+    def __init__(self, path, mode, kind, rows, deadline):
+        super().__init__(daemon=True)
+        self.path, self.mode, self.kind = path, mode, kind
+        self.rows, self.deadline = rows, deadline
+        self.latencies = []
+        self.errors = 0
+
+    def connect(self):
+        pragmas, _, timeout = MODES[self.mode]
+        # Transactions are opened explicitly in write(), so autocommit here.
+        connection = sqlite3.connect(self.path, timeout=timeout, isolation_level=None)
+        if pragmas:
+            connection.executescript(pragmas)
+        return connection
+
+    def read(self, connection):
+        # The gallery list: a page plus its count.
+        connection.execute(
+            'SELECT id, title, caption FROM memory WHERE is_featured = 1 '
+            'ORDER BY "order" LIMIT 50'
+        ).fetchall()
+        connection.execute('SELECT COUNT(*) FROM memory').fetchone()
+
+    def write(self, connection, counter):
+        # Model.save(): read the row, then update it in the same transaction.
+        # A DEFERRED transaction has to upgrade its read lock to write, which
+        # fails at once when another writer got there first.
+        row_id = counter % self.rows + 1
+        connection.execute(f'BEGIN {MODES[self.mode][1]}')
+        try:
+            connection.execute('SELECT "order" FROM memory WHERE id = ?', [row_id]).fetchone()
+            connection.execute(
+                'UPDATE memory SET caption = ?, updated_at = ? WHERE id = ?',
+                [f'edited {counter}', time.time(), row_id]
+            )
+            connection.execute('COMMIT')
+        except sqlite3.OperationalError:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise
+
+    def run(self):
+        connection = self.connect()
+        counter = self.ident
+        while time.perf_counter() < self.deadline:
+            started = time.perf_counter()
+            try:
+                if self.kind == 'read':
+                    self.read(connection)
+                else:
+                    counter += 1
+                    self.write(connection, counter)
+            except sqlite3.OperationalError as exc:
+                if 'locked' not in str(exc):
+                    raise
+                self.errors += 1
+                continue
+            self.latencies.append(time.perf_counter() - started)
+        connection.close()
+
+
+class Command(BaseCommand):
+    """Compare SQLite throughput under concurrent readers and writers, default vs tuned."""
+
+    help = 'Benchmark concurrent SQLite reads and writes with default and tuned settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help='Reader threads')
+        parser.add_argument('--writers', type=int, default=4, help='Writer threads')
+        parser.add_argument('--rows', type=int, default=10_000, help='Rows in the table')
+        parser.add_argument(
+            '--duration', type=float, default=5.0, help='Seconds to run each mode'
+        )
+        parser.add_argument(
+            '--modes', nargs='+', choices=list(MODES), default=list(MODES),
+            help='Configurations to compare'
+        )
+
+    def seed(self, path, mode, rows):
+        connection = sqlite3.connect(path)
+        pragmas = MODES[mode][0]
+        # journal_mode is persistent in the file; set it before loading data.
+        connection.executescript(pragmas or 'PRAGMA journal_mode=DELETE;')
+        connection.executescript(SCHEMA)
+        connection.executemany(
+            'INSERT INTO memory (title, caption, is_featured, "order", updated_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (
+                (f'Memory {i}', f'Caption {i}', int(i % 10 == 0), i, time.time())
+                for i in range(rows)
+            )
+        )
+        connection.commit()
+        connection.close()
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'mode':>8} {'kind':>6} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'locked':>7}"
+        )
+        with tempfile.TemporaryDirectory(prefix='bench-database-') as directory:
+            for mode in options['modes']:
+                path = str(Path(directory) / f'{mode}.sqlite3')
+                self.seed(path, mode, options['rows'])
+
+                deadline = time.perf_counter() + options['duration']
+                workers = [
+                    Worker(path, mode, 'read', options['rows'], deadline)
+                    for _ in range(options['readers'])
+                ] + [
+                    Worker(path, mode, 'write', options['rows'], deadline)
+                    for _ in range(options['writers'])
+                ]
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+
+                for kind in ('read', 'write'):
+                    group = [worker for worker in workers if worker.kind == kind]
+                    if not group:
+                        continue
+                    latencies = [value for worker in group for value in worker.latencies]
+                    errors = sum(worker.errors for worker in group)
+                    self.stdout.write(
+                        f'{mode:>8} {kind:>6} {len(latencies) / options["duration"]:>9.0f} '
+                        f'{statistics.median(latencies) * 1000 if latencies else 0:>8.2f} '
+                        f'{percentile(latencies, 0.95) * 1000:>8.2f} '
+                        f'{percentile(latencies, 0.99) * 1000:>8.2f} {errors:>7}'
+                    )
+        self.stdout.write('locked: operations that failed with "database is locked"')
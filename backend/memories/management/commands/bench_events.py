@@ -0,0 +1,234 @@
+import asyncio
+import json
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from memories.events import STREAM_PATH, UnixSocketBackend
+
+from .bench_api import summarize
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def process_tree(pid):
+    """pid and the pids of its children (uvicorn's workers)."""
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as children:
+            return [pid, *map(int, children.read().split())]
+    except OSError:
+        return [pid]
+
+
+def resident_bytes(pids):
+    """Summed VmRSS of the given processes, from /proc."""
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return total
+
+
+class Stream:
+    """One SSE client: opens the stream and records when each event arrives."""
+
+    def __init__(self, port):
+        self.port = port
+        self.arrivals = {}
+        self.reader = self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        self.writer.write(
+            f'GET {STREAM_PATH} HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+            'Accept: text/event-stream\r\n\r\n'.encode('ascii')
+        )
+        await self.writer.drain()
+        await self.reader.readuntil(b': connected\n\n')
+
+    async def listen(self):
+        while True:
+            try:
+                frame = await self.reader.readuntil(b'\n\n')
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            arrived = time.perf_counter()
+            for line in frame.decode('utf-8').splitlines():
+                if line.startswith('data: '):
+                    self.arrivals[json.loads(line[6:])['id']] = arrived
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class Command(BaseCommand):
+    """
+    Idle-connection and fan-out benchmark for the change stream.
+
+    Starts uvicorn with the UnixSocketBackend on a throwaway socket
+    directory, opens many SSE connections and reports the server's resident
+    memory per connection.  It then publishes events from this process,
+    as a request in another worker would, and measures how long each takes
+    to reach every connection.  Linux only: memory is read from /proc.
+    """
+
+    help = 'Benchmark idle SSE connections per worker and event fan-out latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=2_000, help='SSE clients to open')
+        parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes')
+        parser.add_argument('--events', type=int, default=50, help='Events to publish')
+        parser.add_argument(
+            '--interval', type=float, default=0.1, help='Seconds between published events'
+        )
+        parser.add_argument('--output', help='Write the JSON report here ("-" for stdout)')
+
+    def handle(self, *args, **options):
+        if not sys.platform.startswith('linux'):
+            raise CommandError('bench_events reads process memory from /proc and needs Linux')
+        # Every connection is a file descriptor on both ends.
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        wanted = min(hard, options['connections'] + 1024)
+        if soft < wanted:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+        if wanted < options['connections'] + 64:
+            raise CommandError(f'The open file limit ({hard}) is too low for this many connections')
+
+        self.progress = self.stderr.write if options['output'] == '-' else self.stdout.write
+        scratch = tempfile.mkdtemp(prefix='bench-events-')
+        port = free_port()
+        environment = {
+            **os.environ,
+            'DEBUG': 'False',
+            'DATABASE_URL': f'sqlite:///{os.path.join(scratch, "db.sqlite3")}',
+            'METRICS_DIR': os.path.join(scratch, 'metrics'),
+            'EVENTS_BACKEND': 'memories.events.UnixSocketBackend',
+            'EVENTS_SOCKET_DIR': os.path.join(scratch, 'events'),
+        }
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'uvicorn', 'romantic_gallery.asgi:application',
+                '--host', '127.0.0.1', '--port', str(port),
+                '--workers', str(options['workers']),
+                '--backlog', str(max(2048, options['connections'])),
+                '--log-level', 'warning', '--no-access-log',
+            ],
+            cwd=settings.BASE_DIR,
+            env=environment,
+        )
+        try:
+            with override_settings(EVENTS_SOCKET_DIR=environment['EVENTS_SOCKET_DIR']):
+                report = asyncio.run(self.run(server, port, options))
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+            shutil.rmtree(scratch, ignore_errors=True)
+
+        self.progress(
+            f"{report['connections']} connections on {report['workers']} worker(s): "
+            f"{report['bytes_per_connection'] / 1024:.1f} KiB each, "
+            f"{report['server_rss_bytes'] / 1024 ** 2:.1f} MiB in total"
+        )
+        latency = report['fanout_latency_ms']
+        self.progress(
+            f"fan-out of {report['events']} events: p50 {latency['p50']} ms, "
+            f"p99 {latency['p99']} ms, max {latency['max']} ms, "
+            f"{report['missed_deliveries']} missed"
+        )
+        if options['output']:
+            text = json.dumps(report, indent=2)
+            if options['output'] == '-':
+                self.stdout.write(text)
+            else:
+                with open(options['output'], 'w') as output:
+                    output.write(text + '\n')
+
+    async def run(self, server, port, options):
+        await self.wait_for_server(server, port)
+        pids = process_tree(server.pid)
+        baseline = resident_bytes(pids)
+
+        streams = [Stream(port) for _ in range(options['connections'])]
+        # Open in batches so the accept queue never overflows.
+        for start in range(0, len(streams), 200):
+            await asyncio.gather(*(stream.connect() for stream in streams[start:start + 200]))
+        self.progress(f'{len(streams)} streams connected')
+        listeners = [asyncio.ensure_future(stream.listen()) for stream in streams]
+        # Let the workers settle before reading their memory.
+        await asyncio.sleep(1)
+        loaded = resident_bytes(pids)
+
+        backend = UnixSocketBackend(hub=None)
+        sent, latencies = {}, []
+        try:
+            for number in range(options['events']):
+                event_id = f'bench-{number}'
+                sent[event_id] = time.perf_counter()
+                backend.publish({'type': 'memory', 'action': 'updated', 'id': event_id})
+                await asyncio.sleep(options['interval'])
+            # Wait for stragglers; whatever has not arrived by then is missed.
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline and any(
+                len(stream.arrivals) < len(sent) for stream in streams
+            ):
+                await asyncio.sleep(0.1)
+        finally:
+            for listener in listeners:
+                listener.cancel()
+            for stream in streams:
+                stream.close()
+
+        missed = 0
+        for stream in streams:
+            for event_id, started in sent.items():
+                arrived = stream.arrivals.get(event_id)
+                if arrived is None:
+                    missed += 1
+                else:
+                    latencies.append(arrived - started)
+
+        return {
+            'connections': len(streams),
+            'workers': options['workers'],
+            'server_rss_bytes': loaded,
+            'bytes_per_connection': round((loaded - baseline) / len(streams)) if streams else 0,
+            'events': len(sent),
+            'deliveries': len(latencies),
+            'missed_deliveries': missed,
+            'fanout_latency_ms': summarize(latencies, 0)['latency_ms'],
+        }
+
+    async def wait_for_server(self, server, port):
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'uvicorn exited with status {server.returncode}')
+            try:
+                _, writer = await asyncio.open_connection('127.0.0.1', port)
+            except OSError:
+                await asyncio.sleep(0.1)
+                continue
+            writer.close()
+            # With several workers the port opens before all have started.
+            await asyncio.sleep(1)
+            return
+        raise CommandError('uvicorn did not start within 30 seconds')
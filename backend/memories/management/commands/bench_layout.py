@@ -0,0 +1,63 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from memories.layout import fibonacci_sphere, mean_spacing, random_unit_vectors
+from memories.spatial import cells_for_points
+
+
+def nearest_neighbour_angles(points, sample_size=256, chunk_size=65536, rng=None):
+    """Nearest-neighbour angle (radians) for a random sample of points."""
+    rng = rng or np.random.default_rng(0)
+    sample = rng.choice(len(points), size=min(sample_size, len(points)), replace=False)
+    closest = np.full(len(sample), -1.0)
+    for start in range(0, len(points), chunk_size):
+        dots = points[sample] @ points[start:start + chunk_size].T
+        # Ignore each sampled point's match with itself.
+        own = (sample >= start) & (sample < start + chunk_size)
+        dots[np.nonzero(own)[0], sample[own] - start] = -1.0
+        closest = np.maximum(closest, dots.max(axis=1))
+    return np.arccos(np.clip(closest, -1.0, 1.0))
+
+
+class Command(BaseCommand):
+    """Benchmark the vectorised layout pass and compare spacing with random placement."""
+
+    help = 'Time Fibonacci layout and cell assignment for 10k-1M points'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[10_000, 100_000, 1_000_000],
+            help='Point counts to benchmark'
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per size')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'points':>10} {'layout ms':>10} {'cells ms':>10} {'Mpts/s':>8} "
+            f"{'min nn':>8} {'min nn rnd':>10}"
+        )
+        for size in options['sizes']:
+            layout_times, cell_times = [], []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                points = fibonacci_sphere(size)
+                layout_times.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                cells_for_points(points)
+                cell_times.append(time.perf_counter() - started)
+
+            layout_time, cell_time = min(layout_times), min(cell_times)
+            spacing = mean_spacing(size)
+            lattice = nearest_neighbour_angles(points).min() / spacing
+            scattered = nearest_neighbour_angles(random_unit_vectors(size)).min() / spacing
+            self.stdout.write(
+                f'{size:>10} {layout_time * 1000:>10.1f} {cell_time * 1000:>10.1f} '
+                f'{size / (layout_time + cell_time) / 1e6:>8.2f} '
+                f'{lattice:>8.3f} {scattered:>10.3f}'
+            )
+        self.stdout.write('min nn: smallest sampled nearest-neighbour angle / mean spacing')
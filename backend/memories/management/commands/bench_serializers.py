@@ -0,0 +1,128 @@
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from memories.derivatives import variants_for_urls
+from memories.layout import random_unit_vectors
+from memories.models import MediaAsset, Memory
+from memories.serializers import MemorySerializer, MemoryValuesSerializer
+from memories.spatial import cells_for_points
+
+
+class Command(BaseCommand):
+    """Compare MemorySerializer with the values() fast path on synthetic rows."""
+
+    help = 'Check fast-path equivalence and report rows/sec for memory list serialization'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[100, 1_000, 10_000],
+            help='List sizes to benchmark'
+        )
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per size')
+
+    def handle(self, *args, **options):
+        sizes = options['sizes']
+        # Seed inside a transaction that is always rolled back.
+        with transaction.atomic():
+            self.seed(max(sizes))
+            self.run(sizes, options['repeat'])
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        """
+        Rows that exercise every field the two paths format: positions all over
+        the sphere, sub-second dates, empty and null captions, and media with
+        READY, PENDING and no derivatives.
+        """
+        base = timezone.now()
+        points = random_unit_vectors(count, np.random.default_rng(0))
+        cells = cells_for_points(points).tolist()
+        memories, assets = [], []
+        for i, ((x, y, z), cell) in enumerate(zip(points.tolist(), cells)):
+            name = f'bench/{i}.jpg'
+            if i % 5 == 4:
+                media_url = f'https://cdn.example.net/{i}.jpg'
+            else:
+                media_url = f'https://example.com{settings.MEDIA_URL}{name}'
+            if i % 5 in (0, 1):
+                assets.append(MediaAsset(
+                    name=name, width=1600, height=1200, status='READY',
+                    variants=[
+                        {'kind': kind, 'width': width, 'height': height, 'format': fmt,
+                         'name': f'derivatives/bench/{i}/{kind}-{width}.{fmt}'}
+                        for kind, width, height in (('texture', 1024, 1024), ('image', 800, 600))
+                        for fmt in ('webp', 'avif')
+                    ],
+                ))
+            elif i % 5 == 2:
+                assets.append(MediaAsset(name=name, status='PENDING'))
+            memories.append(Memory(
+                title=f'Benchmark memory {i} \u2764',
+                caption=(None, '', f'Caption {i}: "quoted" \u00e9t\u00e9')[i % 3],
+                media_url=media_url,
+                position_x=x, position_y=y, position_z=z,
+                orbit_radius=3.0 + (i % 7) * 0.25,
+                spatial_cell=cell,
+                is_featured=i % 7 == 0,
+                category=('PHOTO', 'VIDEO', 'AUDIO')[i % 3],
+                date=base - timedelta(hours=i, microseconds=i * 37),
+                order=i % 50,
+            ))
+        MediaAsset.objects.bulk_create(assets, batch_size=2000)
+        Memory.objects.bulk_create(memories, batch_size=2000)
+
+    def run(self, sizes, repeat):
+        renderer = JSONRenderer()
+        self.stdout.write(
+            f"{'rows':>8} {'serializer rows/s':>18} {'fast path rows/s':>17} {'speedup':>8}"
+        )
+        for size in sizes:
+            queryset = Memory.objects.order_by('order', 'date', 'id')[:size]
+            # Both paths look up derivative variants once per batch.
+            context = {'media_variants': variants_for_urls(queryset.values_list('media_url', flat=True))}
+            slow = renderer.render(MemorySerializer(queryset, many=True, context=context).data)
+            fast = renderer.render(
+                MemoryValuesSerializer(MemoryValuesSerializer.values(queryset), many=True).data
+            )
+            if slow != fast:
+                raise CommandError(f'Fast path output differs from MemorySerializer at {size} rows')
+
+            slow_time = self.best_of(
+                repeat,
+                lambda: MemorySerializer(
+                    queryset.all(), many=True,
+                    context={'media_variants': variants_for_urls(
+                        queryset.values_list('media_url', flat=True)
+                    )}
+                ).data
+            )
+            fast_time = self.best_of(
+                repeat,
+                lambda: MemoryValuesSerializer(
+                    MemoryValuesSerializer.values(queryset.all()), many=True
+                ).data
+            )
+            self.stdout.write(
+                f'{size:>8} {size / slow_time:>18,.0f} {size / fast_time:>17,.0f} '
+                f'{slow_time / fast_time:>7.1f}x'
+            )
+        self.stdout.write(self.style.SUCCESS('Fast path output matches MemorySerializer'))
+
+    @staticmethod
+    def best_of(repeat, func):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
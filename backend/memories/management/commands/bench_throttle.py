@@ -0,0 +1,147 @@
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings, teardown_databases
+from rest_framework.request import Request
+
+from memories.throttling import TokenBucketThrottle, bucket_shape, take
+from memories.views import MemoryViewSet
+
+from .bench_api import (
+    UNTHROTTLED, create_test_database, isolated_settings, percentile, seed_memories
+)
+
+LOCAL_CACHE = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'bench-throttle',
+    'OPTIONS': {'MAX_ENTRIES': 1_000_000},
+}
+
+
+class View:
+    throttle_scope = 'bench'
+
+
+class Command(BaseCommand):
+    """
+    Cost of a throttle check.
+
+    Times TokenBucketThrottle.allow_request against the configured throttle
+    cache and a local-memory one: the same client again and again, and a
+    new client on every call (a miss and an insert).  It then times a public
+    request with and without the throttle, and has threads race for one
+    bucket to check that no more requests get through than it allows.
+    """
+
+    help = 'Benchmark the per-request cost of the token-bucket throttle'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=20_000, help='Throttle checks to time')
+        parser.add_argument('--requests', type=int, default=2_000, help='Requests to time')
+        parser.add_argument('--threads', type=int, default=8, help='Threads racing for a bucket')
+
+    def handle(self, *args, **options):
+        caches_to_bench = [(f'{settings.THROTTLE_CACHE_ALIAS} (configured)', None)]
+        if settings.CACHES[settings.THROTTLE_CACHE_ALIAS]['BACKEND'] != LOCAL_CACHE['BACKEND']:
+            caches_to_bench.append(('locmem', LOCAL_CACHE))
+
+        self.stdout.write(f"{'cache':<24} {'client':<8} {'mean us':>8} {'p50 us':>8} {'p99 us':>8}")
+        for name, config in caches_to_bench:
+            # Never runs dry, so every check does the full read and write.
+            overrides = {'THROTTLE_BUCKETS': {'bench': UNTHROTTLED}}
+            if config is not None:
+                overrides.update(
+                    CACHES={**settings.CACHES, 'bench-throttle': config},
+                    THROTTLE_CACHE_ALIAS='bench-throttle',
+                )
+            with override_settings(**overrides):
+                self.bench_checks(name, options['checks'])
+                self.race(name, options['threads'])
+            self.stdout.write('')
+
+        scratch = tempfile.mkdtemp(prefix='bench-throttle-')
+        try:
+            with isolated_settings(scratch):
+                old_config = create_test_database(scratch)
+                try:
+                    seed_memories(100)
+                    self.bench_requests(options['requests'])
+                finally:
+                    teardown_databases(old_config, verbosity=0)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    def bench_checks(self, name, count):
+        factory, view = RequestFactory(), View()
+        requests = {
+            'same': [Request(factory.get('/', REMOTE_ADDR='10.0.0.1'))] * count,
+            'new': [
+                Request(factory.get('/', REMOTE_ADDR=f'10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}'))
+                for n in range(count)
+            ],
+        }
+        for client, batch in requests.items():
+            for request in batch:
+                # Authentication runs before throttling; keep it out of the timing.
+                request.user
+            timings = []
+            for request in batch:
+                throttle = TokenBucketThrottle()
+                started = time.perf_counter()
+                throttle.allow_request(request, view)
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            self.stdout.write(
+                f'{name:<24} {client:<8} {sum(timings) / len(timings) * 1e6:>8.1f} '
+                f'{percentile(timings, 0.50) * 1e6:>8.1f} {percentile(timings, 0.99) * 1e6:>8.1f}'
+            )
+
+    def race(self, name, threads):
+        """Threads take from one bucket as fast as they can for half a second."""
+        interval, capacity = bucket_shape('1000/s', 100)
+        key = f'throttle:bench-race:{time.time()}'
+        allowed = [0] * threads
+        started = time.time()
+
+        def work(number):
+            while time.time() - started < 0.5:
+                if take(key, interval, capacity) == 0:
+                    allowed[number] += 1
+
+        workers = [threading.Thread(target=work, args=(number,)) for number in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        bound = 100 + (time.time() - started) * 1000
+        caches[settings.THROTTLE_CACHE_ALIAS].delete(key)
+        self.stdout.write(
+            f'{name:<24} {threads} threads on one bucket: {sum(allowed)} allowed, '
+            f'at most {bound:.0f} expected'
+        )
+
+    def bench_requests(self, count):
+        client, path = Client(), '/api/memories/featured/'
+        timings = {'throttled': [], 'unthrottled': []}
+        # Interleave the two so drift affects both alike.
+        for _ in range(count):
+            started = time.perf_counter()
+            client.get(path)
+            timings['throttled'].append(time.perf_counter() - started)
+            with mock.patch.object(MemoryViewSet, 'throttle_classes', []):
+                started = time.perf_counter()
+                client.get(path)
+                timings['unthrottled'].append(time.perf_counter() - started)
+        medians = {name: percentile(sorted(values), 0.50) for name, values in timings.items()}
+        self.stdout.write(
+            f"GET {path}: p50 {medians['throttled'] * 1000:.3f} ms throttled, "
+            f"{medians['unthrottled'] * 1000:.3f} ms without, "
+            f"{(medians['throttled'] - medians['unthrottled']) * 1e6:+.1f} us"
+        )
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from memories.manifest import build_manifest
+
+
+class Command(BaseCommand):
+    """Rebuild the universe manifest now, at the smallest brotli size by default."""
+
+    help = 'Rebuild the universe manifest (run after deploys or from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--brotli-level', type=int, default=11,
+            help='Brotli quality; writes rebuild at MANIFEST_BROTLI_LEVEL instead'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        size = build_manifest(options['brotli_level'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Built a {size}-byte manifest in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,193 @@
+import json
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import teardown_databases
+
+from memories.models import Memory
+
+from .bench_api import (
+    ADMIN_PASSWORD, ADMIN_USERNAME, create_test_database, isolated_settings, seed_memories
+)
+
+# Plans are only checked for queries that touch this table.
+CHECKED_TABLE = Memory._meta.db_table
+
+# Problems a plan can show:
+#   full scan   reads the whole table
+#   index scan  walks a whole index with nothing to seek; fine only when the
+#               filter keeps most rows, so LIMIT stops the walk within a page
+#   sort        sorts the matches instead of reading them in index order
+#
+# name, path, staff, problems tolerated.  The unfiltered and public lists
+# (is_secret is rare) and featured (its partial index is the filter) walk an
+# index in order; viewport and search sort a bounded candidate set (the
+# cone's cells, the text matches).
+ENDPOINTS = [
+    ('memory-list', '/api/memories/', False, ('index scan',)),
+    ('memory-list-page-2', '/api/memories/', False, ()),
+    ('memory-featured', '/api/memories/featured/', False, ('index scan',)),
+    ('memory-category', '/api/memories/category/?type=VIDEO', False, ()),
+    ('memory-viewport', '/api/memories/viewport/?x=0&y=0&z=1&angle=10', False, ('sort',)),
+    ('memory-search', '/api/memories/search/?q=memory', False, ('sort',)),
+    ('memory-detail', None, False, ()),
+    ('memory-changes', '/api/memories/changes/', False, ()),
+    ('memory-changes-since', '/api/memories/changes/', False, ()),
+    ('staff-memory-list', '/api/memories/', True, ('index scan',)),
+    ('staff-memory-featured', '/api/memories/featured/', True, ('index scan',)),
+    ('staff-memory-category', '/api/memories/category/?type=AUDIO', True, ()),
+]
+
+
+class QueryRecorder:
+    """execute_wrapper that keeps the SQL and parameters of each SELECT."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def explain_sqlite(cursor, sql, params):
+    """EXPLAIN QUERY PLAN lines and the problems they show."""
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+    lines, problems = [], set()
+    for _, _, _, detail in cursor.fetchall():
+        lines.append(detail)
+        if detail.startswith('SCAN ') and 'VIRTUAL TABLE' not in detail:
+            problems.add('index scan' if ' USING ' in detail else 'full scan')
+        if 'TEMP B-TREE' in detail:
+            problems.add('sort')
+    return lines, problems
+
+
+def explain_postgresql(cursor, sql, params):
+    """EXPLAIN (FORMAT JSON) nodes and the problems they show."""
+    cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    lines, problems = [], set()
+    pending = [(plan[0]['Plan'], 0)]
+    while pending:
+        node, depth = pending.pop()
+        relation = node.get('Relation Name')
+        index = node.get('Index Name')
+        lines.append('  ' * depth + ' '.join(filter(None, [node['Node Type'], relation, index])))
+        if relation == CHECKED_TABLE:
+            if node['Node Type'] == 'Seq Scan':
+                problems.add('full scan')
+            elif 'Index Cond' not in node and node['Node Type'] != 'Bitmap Heap Scan':
+                problems.add('index scan')
+        if node['Node Type'] in ('Sort', 'Incremental Sort'):
+            problems.add('sort')
+        pending.extend((child, depth + 1) for child in reversed(node.get('Plans', [])))
+    return lines, problems
+
+
+EXPLAINERS = {
+    'sqlite': explain_sqlite,
+    'postgresql': explain_postgresql,
+}
+
+
+class Command(BaseCommand):
+    """
+    Query-plan regression check for the memory endpoints.
+
+    Seeds a throwaway database, requests each endpoint through the test
+    client while recording its SQL, and EXPLAINs every query on the memory
+    table.  A full table scan, a walk over a whole index, or a sort (SQLite's
+    temp B-tree) fails the check unless ENDPOINTS tolerates it, so an index
+    that stops matching a view's filter and ordering is caught before it
+    ships.  Exits non-zero on failure, for use in CI.
+    """
+
+    help = 'EXPLAIN the memory endpoint queries and fail on unexpected scans or sorts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20_000, help='Memories to seed')
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Gather planner statistics first, as autovacuum or PRAGMA optimize would'
+        )
+        parser.add_argument('--show-plans', action='store_true', help='Print every plan')
+
+    def handle(self, *args, **options):
+        explain = EXPLAINERS.get(connection.vendor)
+        if explain is None:
+            raise CommandError(f'Query plans cannot be checked on {connection.vendor}')
+
+        scratch = tempfile.mkdtemp(prefix='query-plans-')
+        try:
+            with isolated_settings(scratch):
+                old_config = create_test_database(scratch)
+                try:
+                    seed_memories(options['rows'])
+                    if options['analyze']:
+                        with connection.cursor() as cursor:
+                            cursor.execute('ANALYZE')
+                    failures = self.check_endpoints(explain, options['show_plans'])
+                finally:
+                    teardown_databases(old_config, verbosity=0)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+        if failures:
+            raise CommandError(
+                f'{failures} quer{"y" if failures == 1 else "ies"} on the memory table '
+                'scan or sort unexpectedly'
+            )
+        self.stdout.write(self.style.SUCCESS('All memory queries use an index in order'))
+
+    def check_endpoints(self, explain, show_plans):
+        public, staff = Client(), Client()
+        staff.login(username=ADMIN_USERNAME, password=ADMIN_PASSWORD)
+        failures = 0
+        for name, path, is_staff, tolerated in ENDPOINTS:
+            client = staff if is_staff else public
+            path = self.resolve_path(client, name, path)
+
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                response = client.get(path)
+            if response.status_code != 200:
+                raise CommandError(f'{name}: GET {path} returned {response.status_code}')
+
+            queries = [(sql, params) for sql, params in recorder.queries if CHECKED_TABLE in sql]
+            if not queries:
+                raise CommandError(f'{name}: no query touched {CHECKED_TABLE}')
+            with connection.cursor() as cursor:
+                for sql, params in queries:
+                    lines, problems = explain(cursor, sql, params)
+                    problems -= set(tolerated)
+                    failures += bool(problems)
+                    status = (
+                        self.style.ERROR('FAIL ' + ', '.join(sorted(problems)))
+                        if problems else self.style.SUCCESS('ok')
+                    )
+                    self.stdout.write(f'{name:<24} {status}')
+                    if problems or show_plans:
+                        for line in lines:
+                            self.stdout.write(f'    {line}')
+        return failures
+
+    def resolve_path(self, client, name, path):
+        """Paths that depend on the seeded data: a second page, one memory, a sync token."""
+        if name == 'memory-detail':
+            memory = Memory.objects.filter(is_secret=False).only('pk').first()
+            return f'/api/memories/{memory.pk}/'
+        if name == 'memory-changes-since':
+            token = client.get(path, {'limit': 10}).json()['token']
+            return f'{path}?since={token}'
+        if name == 'memory-list-page-2':
+            next_url = client.get(path).json()['next']
+            return next_url.split('testserver', 1)[-1]
+        return path
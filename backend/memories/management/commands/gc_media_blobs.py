@@ -0,0 +1,109 @@
+from datetime import timedelta
+from functools import partial
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from memories.derivatives import storage_name_for_url
+from memories.models import MediaAsset, MediaBlob, Memory
+
+
+class Command(BaseCommand):
+    """Recount blob references and delete blobs no memory uses."""
+
+    help = 'Garbage-collect unreferenced content-addressed media blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours',
+            type=float,
+            default=24,
+            help='Keep unreferenced blobs touched more recently than this'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk statement')
+        parser.add_argument('--dry-run', action='store_true', help='Report without deleting')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        corrected = self.recount(batch_size)
+        self.stdout.write(f'Corrected {corrected} reference counts')
+
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        orphans = MediaBlob.objects.filter(ref_count=0, updated_at__lt=cutoff)
+        if options['dry_run']:
+            deleted, freed = orphans.count(), sum(orphans.values_list('size', flat=True))
+        else:
+            deleted = freed = 0
+            while True:
+                candidates = list(orphans.values_list('pk', flat=True)[:batch_size])
+                if not candidates:
+                    break
+                with transaction.atomic():
+                    # Re-check under the lock: a blob may have been referenced or
+                    # re-uploaded since it was selected, and then it stays.
+                    batch = list(
+                        orphans.select_for_update().filter(pk__in=candidates).values_list('pk', 'name', 'size')
+                    )
+                    names = [name for _, name, _ in batch]
+                    assets = MediaAsset.objects.filter(name__in=names)
+                    files = names + [
+                        variant['name']
+                        for variants in assets.values_list('variants', flat=True)
+                        for variant in variants
+                    ]
+                    assets.delete()
+                    MediaBlob.objects.filter(pk__in=[pk for pk, _, _ in batch]).delete()
+                    transaction.on_commit(partial(delete_files, files))
+                deleted += len(batch)
+                freed += sum(size for _, _, size in batch)
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {deleted} orphaned blobs ({freed / 1024 ** 2:.1f} MB)'
+        ))
+
+    def recount(self, batch_size):
+        """
+        Rebuild ref_count from the Memory table, fixing any drift from bulk writes.
+
+        Counts from a snapshot pick out the blobs that look wrong; each of those
+        is counted again with its row locked, so a reference added meanwhile is
+        never overwritten by a stale count.
+        """
+        counts = {}
+        for url, total in Memory.objects.values('media_url').annotate(total=Count('id')).values_list(
+            'media_url', 'total'
+        ):
+            name = storage_name_for_url(url)
+            if name:
+                counts[name] = counts.get(name, 0) + total
+
+        corrected = last = 0
+        blobs = MediaBlob.objects.order_by('pk')
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    blobs.select_for_update().filter(pk__gt=last).values_list('pk', 'name', 'ref_count')[:batch_size]
+                )
+                if not batch:
+                    return corrected
+                for pk, name, ref_count in batch:
+                    if ref_count == counts.get(name, 0):
+                        continue
+                    urls = Memory.objects.filter(media_url__contains=name).values_list('media_url', flat=True)
+                    actual = sum(1 for url in urls if storage_name_for_url(url) == name)
+                    if actual != ref_count:
+                        MediaBlob.objects.filter(pk=pk).update(ref_count=actual, updated_at=timezone.now())
+                        corrected += 1
+            last = batch[-1][0]
+
+
+def delete_files(names):
+    """Delete collected files, except blobs uploaded again since they were collected."""
+    stored = set(MediaBlob.objects.filter(name__in=names).values_list('name', flat=True))
+    for name in names:
+        if name not in stored:
+            default_storage.delete(name)
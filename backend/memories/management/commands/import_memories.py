@@ -0,0 +1,247 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from itertools import repeat
+
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from memories import imaging
+from memories.blobs import blob_name
+from memories.derivatives import derivative_dir, stored_variants
+from memories.layout import free_positions
+from memories.models import MediaAsset, MediaBlob, Memory
+from memories.serializers import media_type_for
+from memories.signals import memories_changed_in_bulk
+from memories.spatial import cells_for_points
+
+CATEGORIES = {'image': 'PHOTO', 'video': 'VIDEO', 'audio': 'AUDIO'}
+
+
+class Command(BaseCommand):
+    """
+    Import a directory of media files as memories.
+
+    Files are hashed and their EXIF headers read in a process pool, stored
+    content-addressed like uploads, and inserted with bulk_create per batch.
+    Content that already backs a memory is skipped, so an interrupted import
+    can simply be run again; that also retries derivatives that failed.
+    """
+
+    help = 'Bulk-import a directory of photos, videos and audio as memories'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Directory to walk for media files')
+        parser.add_argument(
+            '--base-url',
+            default='http://localhost:8000',
+            help='Origin prefixed to stored media paths in media_url'
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Memories per bulk_create')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processes for hashing, EXIF reads and derivative rendering'
+        )
+        parser.add_argument(
+            '--skip-derivatives',
+            action='store_true',
+            help='Do not render texture and responsive image sizes'
+        )
+        parser.add_argument('--featured', action='store_true', help='Mark imported memories featured')
+        parser.add_argument('--secret', action='store_true', help='Mark imported memories secret')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not os.path.isdir(directory):
+            raise CommandError(f'{directory} is not a directory')
+
+        paths = self.collect(directory)
+        total = len(paths)
+        self.stdout.write(f'Found {total} media files in {directory}')
+        if not total:
+            return
+
+        self.options = options
+        self.formats = ('webp', 'avif') if imaging.avif_supported() else ('webp',)
+        self.next_order = (Memory.objects.aggregate(last=Max('order'))['last'] or 0) + 1
+        started = time.perf_counter()
+        done = imported = skipped = failed = stored_bytes = 0
+        batch_size = options['batch_size']
+
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+        ) as pool:
+            for start in range(0, total, batch_size):
+                batch = paths[start:start + batch_size]
+                probes = []
+                for path, probe in zip(batch, self.probe(pool, batch)):
+                    if probe is None or (media_type_for(path) == 'image' and not probe['width']):
+                        failed += 1
+                        self.stderr.write(f'  Could not read {path}')
+                    else:
+                        probes.append(probe)
+
+                created, written = self.import_batch(pool, probes)
+                done += len(batch)
+                imported += created
+                skipped += len(probes) - created
+                stored_bytes += written
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'  {done}/{total} files: {imported} imported, {skipped} skipped, '
+                    f'{failed} failed ({done / elapsed:.1f} files/s)'
+                )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} memories from {total} files in {elapsed:.2f}s '
+            f'({total / elapsed:.1f} files/s, {stored_bytes / 1024 ** 2 / elapsed:.1f} MB/s stored)'
+        ))
+
+    def collect(self, directory):
+        """Every importable file below directory, in a stable order."""
+        paths = []
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for filename in sorted(files):
+                if not filename.startswith('.') and media_type_for(filename):
+                    paths.append(os.path.join(root, filename))
+        return paths
+
+    def probe(self, pool, paths):
+        """Probe results in path order, with None for files that could not be read."""
+        futures = [pool.submit(imaging.probe_file, path) for path in paths]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except BrokenProcessPool:
+                raise
+            except Exception:
+                # A corrupt file (bad EXIF, a decompression bomb) skips only itself.
+                results.append(None)
+        return results
+
+    def import_batch(self, pool, probes):
+        """Store and insert one batch, returning (memories created, bytes written)."""
+        # Content already backing a memory was imported by an earlier run.
+        shas = {probe['sha256'] for probe in probes}
+        blobs = dict(
+            MediaBlob.objects.filter(sha256__in=shas).values_list('sha256', 'ref_count')
+        )
+        pending, stored, seen = [], [], set()
+        for probe in probes:
+            sha = probe['sha256']
+            if sha in seen:
+                continue
+            seen.add(sha)
+            (stored if blobs.get(sha, 0) > 0 else pending).append(probe)
+
+        written = 0
+        new_blobs = []
+        for probe in pending:
+            if probe['sha256'] in blobs:
+                continue
+            extension = probe['path'].rsplit('.', 1)[-1].lower()
+            name = blob_name(probe['sha256'], extension)
+            if not default_storage.exists(name):
+                with open(probe['path'], 'rb') as handle:
+                    name = default_storage.save(name, File(handle))
+                written += probe['size']
+            new_blobs.append(MediaBlob(sha256=probe['sha256'], name=name, size=probe['size']))
+        MediaBlob.objects.bulk_create(new_blobs, ignore_conflicts=True)
+        names = dict(MediaBlob.objects.filter(sha256__in=seen).values_list('sha256', 'name'))
+
+        assets = []
+        if not self.options['skip_derivatives']:
+            # Content imported before still gets derivatives that failed or never finished.
+            assets = self.render_derivatives(pool, pending + stored, names)
+
+        memories = self.build_memories(pending, names) if pending else []
+        with transaction.atomic():
+            MediaAsset.objects.bulk_create(
+                assets,
+                update_conflicts=True,
+                unique_fields=['name'],
+                update_fields=['width', 'height', 'variants', 'status', 'updated_at'],
+            )
+            Memory.objects.bulk_create(memories)
+            MediaBlob.objects.filter(sha256__in=[probe['sha256'] for probe in pending]).update(
+                ref_count=F('ref_count') + 1, updated_at=timezone.now()
+            )
+            if memories:
+                memories_changed_in_bulk()
+        return len(memories), written
+
+    def render_derivatives(self, pool, probes, names):
+        """Render derivatives for the batch's images in the pool, as MediaAsset rows."""
+        images = [probe for probe in probes if media_type_for(probe['path']) == 'image']
+        existing = set(MediaAsset.objects.filter(
+            name__in=[names[probe['sha256']] for probe in images], status='READY'
+        ).values_list('name', flat=True))
+        images = [probe for probe in images if names[probe['sha256']] not in existing]
+
+        sources = [default_storage.path(names[probe['sha256']]) for probe in images]
+        outputs = [default_storage.path(derivative_dir(names[probe['sha256']])) for probe in images]
+        futures = [
+            pool.submit(imaging.render_derivatives, source, output, formats)
+            for source, output, formats in zip(sources, outputs, repeat(self.formats))
+        ]
+
+        assets = []
+        for probe, future in zip(images, futures):
+            name = names[probe['sha256']]
+            try:
+                width, height, variants = future.result()
+            except Exception as error:
+                self.stderr.write(f'  Derivatives failed for {probe["path"]}: {error}')
+                assets.append(MediaAsset(
+                    name=name, width=probe['width'], height=probe['height'], status='FAILED'
+                ))
+                continue
+            assets.append(MediaAsset(
+                name=name, width=width, height=height, status='READY',
+                variants=stored_variants(name, variants)
+            ))
+        return assets
+
+    def build_memories(self, probes, names):
+        """Unsaved Memory rows for a batch, placed clear of existing memories."""
+        tz = timezone.get_current_timezone()
+        positions = free_positions(len(probes))
+        cells = cells_for_points(positions).tolist()
+        base_url = self.options['base_url'].rstrip('/')
+        memories = []
+        for probe, (x, y, z), cell in zip(probes, positions, cells):
+            filename = os.path.basename(probe['path'])
+            taken_at = probe['taken_at']
+            if taken_at is not None:
+                date = timezone.make_aware(taken_at, tz)
+            else:
+                date = datetime.fromtimestamp(os.path.getmtime(probe['path']), tz)
+            title = os.path.splitext(filename)[0].replace('_', ' ').replace('-', ' ').strip()
+            memories.append(Memory(
+                title=(title or filename)[:200],
+                media_url=base_url + default_storage.url(names[probe['sha256']]),
+                position_x=x,
+                position_y=y,
+                position_z=z,
+                spatial_cell=cell,
+                category=CATEGORIES[media_type_for(filename)],
+                is_featured=self.options['featured'],
+                is_secret=self.options['secret'],
+                date=date,
+                order=self.next_order,
+            ))
+            self.next_order += 1
+        return memories
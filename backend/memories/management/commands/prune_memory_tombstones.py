@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from memories.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    """Delete delta-sync tombstones older than the retention window."""
+
+    help = 'Prune memory tombstones older than MEMORY_TOMBSTONE_RETENTION_DAYS'
+
+    def handle(self, *args, **options):
+        # Sync tokens older than the same window are refused, so no client
+        # can still need these.
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} tombstones'))
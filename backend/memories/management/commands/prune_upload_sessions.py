@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from memories.uploads import prune_sessions
+
+
+class Command(BaseCommand):
+    """Delete chunked-upload sessions that were never finished, with their part files."""
+
+    help = 'Prune upload sessions older than CHUNKED_UPLOAD_EXPIRY_HOURS'
+
+    def handle(self, *args, **options):
+        # Expired sessions already refuse chunks and finalize, so no client
+        # can still be writing to these.
+        pruned = prune_sessions()
+        self.stdout.write(self.style.SUCCESS(f'Pruned {pruned} upload sessions'))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from memories.layout import relayout
+
+
+class Command(BaseCommand):
+    """Re-place every memory evenly on the unit sphere in one vectorised pass."""
+
+    help = 'Lay all memories out on a Fibonacci sphere in display order'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Rows per bulk_update statement'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(done, total):
+            self.stdout.write(f'  {done}/{total} memories written')
+
+        count = relayout(batch_size=options['batch_size'], progress=progress)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Re-placed {count} memories in {elapsed:.2f}s'
+        ))
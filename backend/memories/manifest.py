@@ -0,0 +1,207 @@
+"""
+Precomputed universe manifest: site settings plus every public memory.
+
+The manifest is stored on disk as plain, gzip and (when the brotli package
+is installed) brotli files, so the read path is a stat and a file send with
+no database work at all.  Committed writes ask a background thread in the
+writing process to rebuild it; the thread waits MANIFEST_BUILD_DELAY seconds
+so a burst of writes costs one build, and uses brotli level
+MANIFEST_BROTLI_LEVEL, since level 11 takes tens of seconds on a large
+collection.  Reads never build: until the first build lands the endpoint
+answers 503.  The build_manifest command rebuilds at full brotli level.
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import Memory, SiteSettings
+from .transactions import on_commit_once
+from .versioning import MEMORIES, SETTINGS, get_versions
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+
+# Content-Encoding token -> file suffix, in server preference order.
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def accepted_encodings(header):
+    """Content codings an Accept-Encoding header allows (q > 0), lower-cased."""
+    accepted = set()
+    for item in header.split(','):
+        token, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if token:
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+def open_variant(header):
+    """
+    Open the best stored variant for an Accept-Encoding header.
+
+    Returns (file object, content coding or None), or None when the
+    manifest has not been built on this host yet; a build is then requested.
+    """
+    accepted = accepted_encodings(header)
+    for encoding, suffix in ENCODINGS:
+        if encoding in accepted or '*' in accepted:
+            try:
+                return open(manifest_path(suffix), 'rb'), encoding
+            except FileNotFoundError:
+                continue
+    try:
+        return open(manifest_path(), 'rb'), None
+    except FileNotFoundError:
+        builder.request()
+        return None
+
+
+def manifest_path(suffix=''):
+    return os.path.join(settings.UNIVERSE_MANIFEST_ROOT, MANIFEST_NAME + suffix)
+
+
+def build_document():
+    """Return the manifest as compact JSON bytes."""
+    # Imported here: serializers -> layout -> manifest would otherwise be circular.
+    from .serializers import MemoryValuesSerializer, SiteSettingsSerializer
+
+    settings_obj = SiteSettings.objects.first() or SiteSettings()
+    memories = MemoryValuesSerializer.values(
+        Memory.objects.filter(is_secret=False).order_by('order', 'date', 'id')
+    )
+    memories_version, settings_version = get_versions(MEMORIES, SETTINGS)
+    document = {
+        'version': {'memories': memories_version, 'settings': settings_version},
+        'settings': SiteSettingsSerializer(settings_obj).data,
+        'memories': MemoryValuesSerializer(memories, many=True).data,
+    }
+    return json.dumps(document, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def build_manifest(brotli_level=11):
+    """Rebuild the manifest and its compressed forms, replacing the files atomically."""
+    root = settings.UNIVERSE_MANIFEST_ROOT
+    os.makedirs(root, exist_ok=True)
+    # Serialise builds so a slow build of older data never lands last.
+    with _build_lock(root):
+        body = build_document()
+        variants = [('', body), ('.gz', gzip.compress(body, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(body, quality=brotli_level)))
+        # Compressed files go first: the read path takes a missing plain
+        # file to mean no build yet, so once it exists the others do too.
+        # Validators come from the stat of whichever variant is served.
+        for suffix, data in reversed(variants):
+            _write_atomic(manifest_path(suffix), data)
+    return len(body)
+
+
+class Builder:
+    """A background thread that rebuilds the manifest, coalescing bursts of requests."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.pending = False
+        self.stopping = False
+        self.thread = None
+
+    def request(self):
+        """Ask for a rebuild; returns at once.  Any thread."""
+        with self.condition:
+            self.pending = True
+            # is_alive() also catches a thread object inherited across fork().
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name='manifest-builder', daemon=True
+                )
+                self.thread.start()
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopping:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                if not self.stopping:
+                    # Writes arriving meanwhile are covered by this build.
+                    self.condition.wait_for(
+                        lambda: self.stopping, timeout=settings.MANIFEST_BUILD_DELAY
+                    )
+                self.pending = False
+            try:
+                build_manifest(settings.MANIFEST_BROTLI_LEVEL)
+            except Exception:
+                logger.exception("Manifest rebuild failed")
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        """Finish a pending build and end the thread, so a management command's writes land."""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+            thread = self.thread
+        if thread is not None and thread.is_alive():
+            thread.join()
+
+
+builder = Builder()
+atexit.register(builder.stop)
+
+
+def schedule_build():
+    """Have the manifest rebuilt in the background once the current transaction commits."""
+    on_commit_once(builder.request)
+
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.manifest-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+@contextmanager
+def _build_lock(root):
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(root, '.build.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
\ No newline at end of file
@@ -0,0 +1,237 @@
+"""
+Media file serving with byte ranges, validators and proxy offload.
+
+Whole files go out through FileResponse, which WSGI servers with a
+file_wrapper (gunicorn, uWSGI) send with os.sendfile.  Range requests are
+answered with 206 for one range or multipart/byteranges for several.  When
+MEDIA_SENDFILE names a front proxy, the response only carries an
+X-Accel-Redirect or X-Sendfile header and the proxy does the transfer,
+ranges included.
+
+Upload names embed a UUID or the SHA-256 of the content and never change
+meaning, so they are served with an immutable, year-long Cache-Control.
+"""
+import mimetypes
+import os
+import re
+import stat
+import uuid
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_http_methods
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+
+# More ranges than this (after merging) are answered with the whole file.
+MAX_RANGES = 16
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+# A UUID or SHA-256 file stem, or a derivatives/<stem>/ directory.
+_IMMUTABLE_NAME = re.compile(
+    r'(^|/)([0-9a-f]{64}|[0-9a-f]{32}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})[._/]'
+)
+_SHA256_STEM = re.compile(r'^[0-9a-f]{64}$')
+_RANGE_SPEC = re.compile(r'^(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def is_immutable(name):
+    """Whether a media name is content- or UUID-addressed and never rewritten."""
+    return bool(_IMMUTABLE_NAME.search(name.lower()))
+
+
+def parse_range(header, size):
+    """
+    Parse a Range header against a file of `size` bytes.
+
+    Returns a sorted list of merged inclusive (start, end) pairs, or None when
+    the header is malformed or not worth honouring, in which case the whole
+    file is sent.  Raises RangeNotSatisfiable when no range overlaps the file.
+    """
+    unit, _, specs = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not specs.strip():
+        return None
+
+    ranges = []
+    for spec in specs.split(','):
+        match = _RANGE_SPEC.match(spec.strip())
+        if not match:
+            return None
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if last and end < start:
+                return None
+            if start >= size:
+                continue
+            ranges.append((start, min(end, size - 1)))
+        elif last:
+            suffix = int(last)
+            if suffix == 0:
+                continue
+            ranges.append((max(0, size - suffix), size - 1))
+        else:
+            return None
+
+    if not ranges:
+        raise RangeNotSatisfiable
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    if len(merged) > MAX_RANGES:
+        return None
+    return merged
+
+
+def etag_for(name, stats):
+    """Strong ETag: the content hash for blobs, otherwise size and mtime."""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    if _SHA256_STEM.match(stem):
+        return f'"{stem}"'
+    return f'"{stats.st_size:x}-{stats.st_mtime_ns:x}"'
+
+
+def _if_range_matches(request, etag, last_modified):
+    """Whether an If-Range precondition (if any) still allows a partial response."""
+    validator = request.headers.get('If-Range')
+    if not validator:
+        return True
+    validator = validator.strip()
+    if validator.startswith('"'):
+        return validator == etag
+    return parse_http_date_safe(validator) == last_modified
+
+
+def _read_range(path, start, end):
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = handle.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def _multipart_parts(ranges, size, content_type, boundary):
+    """(header bytes, start, end) for each part, plus the closing delimiter."""
+    parts = [
+        (
+            (
+                f'\r\n--{boundary}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+            ).encode('ascii'),
+            start,
+            end,
+        )
+        for start, end in ranges
+    ]
+    return parts, f'\r\n--{boundary}--\r\n'.encode('ascii')
+
+
+def _stream_multipart(path, parts, closing):
+    for header, start, end in parts:
+        yield header
+        yield from _read_range(path, start, end)
+    yield closing
+
+
+def _offload_response(name, path, content_type):
+    """Hand the transfer to the front proxy configured in MEDIA_SENDFILE."""
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_SENDFILE == 'x-accel':
+        response['X-Accel-Redirect'] = settings.MEDIA_SENDFILE_PREFIX.rstrip('/') + '/' + quote(name)
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+@require_http_methods(['GET', 'HEAD'])
+def serve_media(request, path):
+    """Serve a file below MEDIA_ROOT with validators, byte ranges and caching."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Media file not found")
+    try:
+        stats = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("Media file not found")
+    if not stat.S_ISREG(stats.st_mode):
+        raise Http404("Media file not found")
+
+    name = path.replace(os.sep, '/')
+    size = stats.st_size
+    last_modified = int(stats.st_mtime)
+    etag = etag_for(name, stats)
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    def finish(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = (
+            IMMUTABLE_CACHE_CONTROL if is_immutable(name) else REVALIDATE_CACHE_CONTROL
+        )
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return finish(conditional)
+
+    if settings.MEDIA_SENDFILE:
+        # The proxy evaluates Range and If-Range itself.
+        return finish(_offload_response(name, full_path, content_type))
+
+    ranges = None
+    range_header = request.headers.get('Range')
+    if range_header and _if_range_matches(request, etag, last_modified):
+        try:
+            ranges = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return finish(response)
+
+    if ranges is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        response['Content-Length'] = str(size)
+        return finish(response)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(
+            _read_range(full_path, start, end), status=206, content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+        return finish(response)
+
+    boundary = uuid.uuid4().hex
+    parts, closing = _multipart_parts(ranges, size, content_type, boundary)
+    length = sum(len(header) + end - start + 1 for header, start, end in parts) + len(closing)
+    response = StreamingHttpResponse(
+        _stream_multipart(full_path, parts, closing),
+        status=206,
+        content_type=f'multipart/byteranges; boundary={boundary}',
+    )
+    response['Content-Length'] = str(length)
+    return finish(response)
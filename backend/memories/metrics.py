@@ -0,0 +1,288 @@
+"""
+Per-request performance metrics with Prometheus text exposition.
+
+MetricsMiddleware times every request that resolves to a view, counting
+database queries and their time through connection.execute_wrapper, and
+records the results in an in-process registry of counters and histograms.
+It also sets a Server-Timing header so the same numbers show up in browser
+dev tools.
+
+Each worker process periodically writes a snapshot of its registry to its
+own file in METRICS_DIR; the metrics endpoint merges every file with the
+live registry of the serving worker, so the totals cover all gunicorn
+workers.  Files are never rewritten by another process, so counters only
+go up; clear METRICS_DIR when deploying, as with any multi-process
+Prometheus setup.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import BasePermission
+
+# Histogram name -> (help, upper bounds)
+HISTOGRAMS = {
+    'http_request_duration_seconds': (
+        'Wall time spent in the view and middleware',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    ),
+    'http_request_db_queries': (
+        'Database queries run per request',
+        (0, 1, 2, 3, 5, 10, 20, 50, 100),
+    ),
+    'http_response_size_bytes': (
+        'Response body size before content encoding (Content-Length for streamed responses)',
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+    ),
+    'http_response_sent_bytes': (
+        'Response body bytes sent, after content encoding',
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+    ),
+}
+
+# Counter name -> help
+COUNTERS = {
+    'http_requests_total': 'Requests by view, method and status',
+    'http_request_db_queries_total': 'Database queries run by view',
+    'http_request_db_seconds_total': 'Database time spent by view',
+}
+
+# Label names per metric, in the order values are stored.
+_LABELS = {
+    'http_requests_total': ('view', 'method', 'status'),
+    'http_request_db_queries_total': ('view',),
+    'http_request_db_seconds_total': ('view',),
+    'http_request_duration_seconds': ('view', 'method'),
+    'http_request_db_queries': ('view',),
+    'http_response_size_bytes': ('view',),
+    'http_response_sent_bytes': ('view',),
+}
+
+
+class Registry:
+    """Thread-safe counters and histograms for one process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.name = f'{self.pid}-{uuid.uuid4().hex[:8]}'
+        self.counters = {}
+        self.histograms = {}
+        self.flushed_at = 0.0
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        bounds = HISTOGRAMS[name][1]
+        key = (name, labels)
+        state = self.histograms.get(key)
+        if state is None:
+            # One count per bucket plus +Inf, then the running sum.
+            state = self.histograms[key] = [0] * (len(bounds) + 1) + [0.0]
+        for index, bound in enumerate(bounds):
+            if value <= bound:
+                break
+        else:
+            index = len(bounds)
+        state[index] += 1
+        state[-1] += value
+
+    def record(self, view, method, status, duration, queries, db_time, size, sent):
+        with self.lock:
+            if os.getpid() != self.pid:
+                # Forked from a process that had already recorded requests.
+                self.reset()
+            self.inc('http_requests_total', (view, method, str(status)))
+            self.inc('http_request_db_queries_total', (view,), queries)
+            self.inc('http_request_db_seconds_total', (view,), db_time)
+            self.observe('http_request_duration_seconds', (view, method), duration)
+            self.observe('http_request_db_queries', (view,), queries)
+            if size is not None:
+                self.observe('http_response_size_bytes', (view,), size)
+            if sent is not None:
+                self.observe('http_response_sent_bytes', (view,), sent)
+            due = time.monotonic() - self.flushed_at >= settings.METRICS_FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            counters = [
+                [name, list(labels), value] for (name, labels), value in self.counters.items()
+            ]
+            histograms = [
+                [name, list(labels), list(state)]
+                for (name, labels), state in self.histograms.items()
+            ]
+        return {'counters': counters, 'histograms': histograms}
+
+    def flush(self):
+        """Write this process's snapshot to its file in METRICS_DIR."""
+        self.flushed_at = time.monotonic()
+        if not self.counters or os.getpid() != self.pid:
+            return
+        directory = settings.METRICS_DIR
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+            with os.fdopen(fd, 'w') as tmp:
+                json.dump(self.snapshot(), tmp, separators=(',', ':'))
+            os.replace(tmp_path, os.path.join(directory, f'{self.name}.json'))
+        except OSError:
+            # Metrics must never break a request.
+            pass
+
+
+registry = Registry()
+# Keep the last few seconds of a worker that exits (max_requests, reload).
+atexit.register(registry.flush)
+
+
+def collect():
+    """Merge every worker's last snapshot with this worker's live registry."""
+    snapshots = [registry.snapshot()]
+    own = f'{registry.name}.json'
+    try:
+        names = [name for name in os.listdir(settings.METRICS_DIR) if name.endswith('.json')]
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        if name == own:
+            continue
+        try:
+            with open(os.path.join(settings.METRICS_DIR, name)) as handle:
+                snapshots.append(json.load(handle))
+        except (OSError, ValueError):
+            continue
+
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, state in snapshot['histograms']:
+            key = (name, tuple(labels))
+            merged = histograms.get(key)
+            histograms[key] = state if merged is None else [a + b for a, b in zip(merged, state)]
+    return counters, histograms
+
+
+def _label_text(name, values, extra=''):
+    pairs = [
+        '{}="{}"'.format(label, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for label, value in zip(_LABELS[name], values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}'
+
+
+def render_prometheus(counters, histograms):
+    """Prometheus text exposition format 0.0.4."""
+    lines = []
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f'{name}{_label_text(name, labels)} {value}')
+    for name, (help_text, bounds) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (metric, labels), state in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip([*bounds, '+Inf'], state[:-1]):
+                cumulative += count
+                bucket = _label_text(name, labels, 'le="%s"' % bound)
+                lines.append(f'{name}_bucket{bucket} {cumulative}')
+            lines.append(f'{name}_sum{_label_text(name, labels)} {state[-1]}')
+            lines.append(f'{name}_count{_label_text(name, labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+class QueryTimer:
+    """execute_wrapper that counts queries and sums their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """Record timing, query and size metrics for requests that reach a view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return response
+
+        if response.streaming:
+            length = response.get('Content-Length')
+            sent = int(length) if length and length.isdigit() else None
+        else:
+            sent = len(response.content)
+        # CompressionMiddleware runs inside this one; the payload size is what
+        # serializer and field changes shrink, the sent size what compression does.
+        size = getattr(response, 'uncompressed_length', sent)
+        registry.record(
+            match.view_name or match.route, request.method, response.status_code,
+            duration, timer.count, timer.elapsed, size, sent
+        )
+        response['Server-Timing'] = (
+            f'app;dur={duration * 1000:.1f}, '
+            f'db;dur={timer.elapsed * 1000:.1f};desc="{timer.count} queries"'
+        )
+        return response
+
+
+class IsStaffOrMetricsToken(BasePermission):
+    """Staff sessions, or a scraper presenting `Authorization: Bearer <METRICS_TOKEN>`."""
+
+    def has_permission(self, request, view):
+        token = settings.METRICS_TOKEN
+        if token and request.headers.get('Authorization') == f'Bearer {token}':
+            return True
+        return bool(request.user and request.user.is_staff)
+
+
+@api_view(['GET'])
+@permission_classes([IsStaffOrMetricsToken])
+def metrics(request):
+    """Prometheus metrics aggregated over all worker processes."""
+    return HttpResponse(
+        render_prometheus(*collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
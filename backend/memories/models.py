@@ -1,8 +1,12 @@
+import time
 import uuid
+from django.core.cache import cache
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.conf import settings
 
+from .spatial import cell_for_point
+
 
 class Memory(models.Model):
     """Memory model for storing romantic memories in 3D space."""
@@ -23,6 +27,11 @@ class Memory(models.Model):
     position_y = models.FloatField(default=0.0, help_text="Y position on sphere")
     position_z = models.FloatField(default=0.0, help_text="Z position on sphere")
     orbit_radius = models.FloatField(default=5.0, help_text="Distance from center")
+    spatial_cell = models.BigIntegerField(
+        default=0,
+        editable=False,
+        help_text="Cube-face quadtree cell of the position, derived on save"
+    )
 
     # Memory properties
     is_secret = models.BooleanField(default=False, help_text="Hidden memory requiring discovery")
@@ -37,15 +46,37 @@ class Memory(models.Model):
 
     class Meta:
         ordering = ['order', 'date']
+        # The list endpoints page in ('order', 'date', 'id') order, so each
+        # index ends with the full sort key and the database walks it in order,
+        # stopping at the page size instead of sorting every match.  is_secret
+        # trails so the public filter is checked inside the index.  Booleans
+        # are filtered as bare columns ("is_featured"), which an index can
+        # only seek as a partial-index condition.  check_query_plans guards
+        # these plans.
         indexes = [
-            models.Index(fields=['is_secret', 'is_featured']),
-            models.Index(fields=['category']),
+            models.Index(fields=['order', 'date', 'id', 'is_secret']),
+            models.Index(
+                fields=['order', 'date', 'id', 'is_secret'],
+                condition=models.Q(is_featured=True),
+                name='memories_featured_order_idx'
+            ),
+            models.Index(fields=['category', 'order', 'date', 'id', 'is_secret']),
             models.Index(fields=['date']),
+            models.Index(fields=['spatial_cell', 'is_secret']),
+            # Delta sync pages through changes in (updated_at, id) order.
+            models.Index(fields=['updated_at', 'id']),
         ]
 
     def __str__(self):
         return f"{self.title} ({self.category})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored media_url so blob reference counts can follow edits.
+        instance._loaded_media_url = instance.__dict__.get('media_url')
+        return instance
+
     def clean(self):
         """Validate 3D position data."""
         # Normalize position to unit sphere surface
@@ -54,6 +85,20 @@ class Memory(models.Model):
             self.position_x /= magnitude
             self.position_y /= magnitude
             self.position_z /= magnitude
+        self.update_spatial_cell()
+
+    def save(self, *args, **kwargs):
+        self.update_spatial_cell()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            # Partial saves still move updated_at, which delta sync relies on.
+            derived = [name for name in ('spatial_cell', 'updated_at') if name not in update_fields]
+            kwargs['update_fields'] = [*update_fields, *derived]
+        super().save(*args, **kwargs)
+
+    def update_spatial_cell(self):
+        """Recompute the spatial cell from the current position."""
+        self.spatial_cell = cell_for_point(self.position_x, self.position_y, self.position_z)
 
 
 class SiteSettings(models.Model):
@@ -98,11 +143,60 @@ class SiteSettings(models.Model):
     def __str__(self):
         return f"Site Settings (updated {self.updated_at.strftime('%Y-%m-%d')})"
 
+    # Shared cache entry plus a short-lived copy in each worker process.
+    CACHE_KEY = 'memories:site_settings'
+    CACHE_TIMEOUT = 60
+    LOCAL_TIMEOUT = 5
+    _local = None
+    _local_expires = 0.0
+
     def save(self, *args, **kwargs):
         # Ensure only one SiteSettings instance exists
         if not self.pk and SiteSettings.objects.exists():
             raise ValidationError("Only one SiteSettings instance is allowed")
         super().save(*args, **kwargs)
+        SiteSettings._store(self)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        SiteSettings.invalidate()
+        return result
+
+    @classmethod
+    def load(cls):
+        """
+        Return the settings singleton without touching the database when cached.
+
+        Reads this process's copy for LOCAL_TIMEOUT seconds, then the shared
+        cache, and only then the database.  Other workers therefore see a save
+        within LOCAL_TIMEOUT when the cache is shared, and within
+        CACHE_TIMEOUT + LOCAL_TIMEOUT when it is not.  If no row exists yet an
+        unsaved default instance is returned; nothing is created here.
+        """
+        now = time.monotonic()
+        if cls._local is not None and now < cls._local_expires:
+            return cls._local
+
+        instance = cache.get(cls.CACHE_KEY)
+        if instance is None:
+            instance = cls.objects.first() or cls()
+            cache.set(cls.CACHE_KEY, instance, cls.CACHE_TIMEOUT)
+        cls._local = instance
+        cls._local_expires = now + cls.LOCAL_TIMEOUT
+        return instance
+
+    @classmethod
+    def invalidate(cls):
+        """Drop the cached singleton in this process and the shared cache."""
+        cache.delete(cls.CACHE_KEY)
+        cls._local = None
+        cls._local_expires = 0.0
+
+    @classmethod
+    def _store(cls, instance):
+        cache.set(cls.CACHE_KEY, instance, cls.CACHE_TIMEOUT)
+        cls._local = instance
+        cls._local_expires = time.monotonic() + cls.LOCAL_TIMEOUT
 
     @property
     def theme_colors(self):
@@ -111,4 +205,90 @@ class SiteSettings(models.Model):
             "primary": self.theme_color_primary,
             "secondary": self.theme_color_secondary,
             "star": self.theme_color_star,
-        }
\ No newline at end of file
+        }
+
+
+class MediaBlob(models.Model):
+    """A stored media file addressed by the SHA-256 of its content."""
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True, help_text="Storage name of the blob")
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0, help_text="Memories using this blob")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ref_count', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class MediaAsset(models.Model):
+    """An uploaded image and the derivatives generated from it."""
+
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('READY', 'Ready'),
+        ('FAILED', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=255, unique=True, help_text="Storage name of the original file")
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    variants = models.JSONField(default=list, blank=True, help_text="Generated derivative files")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
+class UploadSession(models.Model):
+    """A resumable chunked upload whose bytes are accumulating in a part file."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions'
+    )
+    filename = models.CharField(max_length=255, help_text="Client-side file name")
+    size = models.PositiveBigIntegerField(help_text="Declared total size in bytes")
+    checksum = models.CharField(max_length=64, blank=True, help_text="Expected SHA-256 of the whole file")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.size} bytes)"
+
+
+class CollectionVersion(models.Model):
+    """Monotonic change counter for a served collection, used to build ETags."""
+
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class MemoryTombstone(models.Model):
+    """A deleted memory, kept so delta sync can tell clients to drop it."""
+
+    memory_id = models.UUIDField()
+    deleted_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.memory_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,176 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import F, Func, Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Memory
+
+
+class MemoryCursorPagination(BasePagination):
+    """
+    Keyset pagination over Memory's ('order', 'date') ordering.
+
+    The cursor carries the full sort key of the boundary row, with 'id' as a
+    tiebreaker, so every page is a range seek instead of an OFFSET scan and
+    cursors stay stable while memories are added or removed.
+    """
+    ordering = ('order', 'date', 'id')
+    cursor_query_param = 'cursor'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.position, self.reverse = self.decode_cursor(request)
+
+        ordering = self.get_ordering(self.reverse)
+        if not getattr(view, 'ordering_from_index', True):
+            ordering = self.get_sort_ordering(self.reverse)
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(self.position, self.reverse))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+
+        # Moving forward there is always a way back unless we started at the
+        # beginning; moving backward there is always a way forward again.
+        if self.reverse:
+            self.has_next = bool(results)
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None and bool(results)
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, reverse=False):
+        """Return the order_by() arguments for the requested direction."""
+        if reverse:
+            return [f'-{field}' for field in self.ordering]
+        return list(self.ordering)
+
+    def get_sort_ordering(self, reverse=False):
+        """
+        The same ordering in a form no index can supply.
+
+        For views whose filter is selective (such as a viewport's cell ranges),
+        walking the ordering index and testing every row is the slow plan.  A
+        unary plus on the leading column makes it an expression, so the
+        database seeks the filter's index and sorts the matches instead.
+        """
+        first = Func(F(self.ordering[0]), template='+%(expressions)s')
+        ordering = [first, *(F(field) for field in self.ordering[1:])]
+        return [field.desc() if reverse else field.asc() for field in ordering]
+
+    def get_keyset_filter(self, position, reverse=False):
+        """
+        Build the row-value comparison (order, date, id) > position.
+
+        The leading bound on the first column lets the database range-seek an
+        index on it; the OR chain resolves ties on the remaining columns.
+        """
+        lookup = 'lt' if reverse else 'gt'
+        first = self.ordering[0]
+        keyset = Q()
+        for index, field in enumerate(self.ordering):
+            clause = Q(**{f'{field}__{lookup}': position[index]})
+            for prior, value in zip(self.ordering[:index], position[:index]):
+                clause &= Q(**{prior: value})
+            keyset |= clause
+        bound = Q(**{f'{first}__{lookup}e': position[0]})
+        return bound & keyset
+
+    def get_position(self, item):
+        """Extract the sort key from a model instance or a values() row."""
+        if isinstance(item, dict):
+            return [item[field] for field in self.ordering]
+        return [getattr(item, field) for field in self.ordering]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            order, date, pk = payload['p']
+            reverse = bool(payload.get('r', False))
+            date = parse_datetime(date)
+            if date is None:
+                raise ValueError(date)
+            position = [int(order), date, self._parse_pk(pk)]
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+    def encode_cursor(self, position, reverse=False):
+        order, date, pk = position
+        payload = {'p': [order, date.isoformat(), str(pk)]}
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        ).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.get_position(self.page[0]), reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    @staticmethod
+    def _parse_pk(pk):
+        try:
+            return Memory._meta.pk.to_python(pk)
+        except DjangoValidationError:
+            raise ValueError(pk)
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Full-text search over memory titles and captions.
+
+SQLite uses an external-content FTS5 table and PostgreSQL a generated,
+GIN-indexed tsvector column.  In both cases the database keeps the index
+current (triggers on SQLite, the generated column on PostgreSQL), so
+bulk_create, bulk_update and raw deletes stay in sync as well as save()
+and delete().  Migrations are generated per install, so the index is
+installed from post_migrate rather than from a migration.  Other backends
+fall back to unranked icontains filtering.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+MEMORY_TABLE = 'memories_memory'
+FTS_TABLE = 'memories_memory_fts'
+FTS_TRIGGERS = ('memories_memory_fts_ai', 'memories_memory_fts_ad', 'memories_memory_fts_au')
+
+# bm25 column weights: a title hit counts ten times a caption hit.
+FTS_WEIGHTS = (10.0, 1.0)
+SEARCH_CONFIG = 'english'
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+_SQLITE_INDEX = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, caption,
+        content='{MEMORY_TABLE}', content_rowid='rowid',
+        tokenize='porter unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS memories_memory_fts_ai AFTER INSERT ON {MEMORY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, caption) VALUES (new.rowid, new.title, new.caption);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS memories_memory_fts_ad AFTER DELETE ON {MEMORY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, caption)
+        VALUES ('delete', old.rowid, old.title, old.caption);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS memories_memory_fts_au AFTER UPDATE OF title, caption
+    ON {MEMORY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, caption)
+        VALUES ('delete', old.rowid, old.title, old.caption);
+        INSERT INTO {FTS_TABLE}(rowid, title, caption) VALUES (new.rowid, new.title, new.caption);
+    END
+    """,
+]
+
+_POSTGRES_INDEX = [
+    f"""
+    ALTER TABLE {MEMORY_TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(caption, '')), 'B')
+    ) STORED
+    """,
+    f"""
+    CREATE INDEX IF NOT EXISTS memories_memory_search_idx
+    ON {MEMORY_TABLE} USING GIN (search_vector)
+    """,
+]
+
+
+def install_search_index(using='default'):
+    """
+    Create the search index and its sync machinery if missing.
+
+    On SQLite, Django rebuilds a table to alter it, which drops its triggers
+    and renumbers rowids, so any missing trigger causes a full reindex.
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s",
+                [MEMORY_TABLE]
+            )
+            if set(FTS_TRIGGERS) <= {row[0] for row in cursor.fetchall()}:
+                return
+            for statement in _SQLITE_INDEX:
+                cursor.execute(statement)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        elif connection.vendor == 'postgresql':
+            for statement in _POSTGRES_INDEX:
+                cursor.execute(statement)
+
+
+def fts_query(tokens):
+    """
+    Quote words into a safe FTS5 query: every word must match, the last as
+    a prefix so results follow the user while they type.
+    """
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search_memories(queryset, text):
+    """
+    Narrow a Memory queryset to matches for `text`, best match first.
+
+    The queryset's own filters (such as is_secret for anonymous users) are
+    kept; matches are annotated with search_rank, higher being better.
+    """
+    tokens = _TOKEN.findall(text)
+    if not tokens:
+        return queryset.none()
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        # Join the FTS table so SQLite drives the query from the MATCH.
+        return queryset.extra(
+            select={'search_rank': f'-bm25({FTS_TABLE}, {weights})'},
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {MEMORY_TABLE}.rowid', f'{FTS_TABLE} MATCH %s'],
+            params=[fts_query(tokens)],
+            order_by=['-search_rank', 'order', 'date', 'id'],
+        )
+    if vendor == 'postgresql':
+        tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        return queryset.extra(
+            select={'search_rank': f'ts_rank_cd({MEMORY_TABLE}.search_vector, {tsquery})'},
+            select_params=[text],
+            where=[f'{MEMORY_TABLE}.search_vector @@ {tsquery}'],
+            params=[text],
+            order_by=['-search_rank', 'order', 'date', 'id'],
+        )
+
+    terms = Q()
+    for token in tokens:
+        terms &= Q(title__icontains=token) | Q(caption__icontains=token)
+    return queryset.filter(terms).extra(select={'search_rank': '0'}).order_by('order', 'date', 'id')
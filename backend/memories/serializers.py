@@ -1,5 +1,10 @@
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
+from .derivatives import variants_for_urls
+from .layout import free_position
 from .models import Memory, SiteSettings
+from .sync import decode_token
 import uuid
 
 
@@ -10,18 +15,41 @@ class PositionSerializer(serializers.Serializer):
     z = serializers.FloatField()
 
 
+class MemoryPositionSerializer(PositionSerializer):
+    """Read-only position object sourced from a Memory's position_x/y/z columns."""
+    x = serializers.FloatField(source='position_x')
+    y = serializers.FloatField(source='position_y')
+    z = serializers.FloatField(source='position_z')
+
+
 class MemorySerializer(serializers.ModelSerializer):
     """Serializer for Memory model."""
-    position = PositionSerializer(source='*', read_only=True)
+    position = MemoryPositionSerializer(source='*', read_only=True)
+    variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Memory
         fields = [
-            'id', 'title', 'caption', 'media_url', 'position', 'orbit_radius',
-            'is_featured', 'category', 'date', 'order'
+            'id', 'title', 'caption', 'media_url', 'variants', 'position',
+            'orbit_radius', 'is_featured', 'category', 'date', 'order'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    def __init__(self, *args, **kwargs):
+        """Accept fields=[...] to serialize only a subset of the fields."""
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def get_variants(self, obj):
+        """Per-size derivative URLs, from context['media_variants'] when batched."""
+        variants = self.context.get('media_variants')
+        if variants is None:
+            variants = variants_for_urls([obj.media_url])
+        return variants.get(obj.media_url, [])
+
     def to_representation(self, instance):
         """Convert position fields to nested position object."""
         data = super().to_representation(instance)
@@ -33,6 +61,163 @@ class MemorySerializer(serializers.ModelSerializer):
         return data
 
 
+class MemoryValuesSerializer:
+    """
+    Read-only fast path producing MemorySerializer's output from values() rows.
+
+    Rows come from ``MemoryValuesSerializer.values(queryset)``, so no model
+    instances are built and no per-field serializer calls are made.  Given
+    ``fields``, both the selected columns and the output narrow to those
+    fields.  Only the ``.data`` part of the serializer interface is provided.
+    """
+    columns = (
+        'id', 'title', 'caption', 'media_url', 'position_x', 'position_y',
+        'position_z', 'orbit_radius', 'is_featured', 'category', 'date', 'order'
+    )
+    # Output fields that read other (or several) columns.
+    field_columns = {
+        'variants': ('media_url',),
+        'position': ('position_x', 'position_y', 'position_z'),
+    }
+
+    def __init__(self, instance, many=False, media_variants=None, fields=None):
+        self.instance = instance
+        self.many = many
+        self.media_variants = media_variants
+        self.fields = fields
+
+    @classmethod
+    def columns_for(cls, fields):
+        """Columns needed to render the given output fields, in a stable order."""
+        if fields is None:
+            return cls.columns
+        needed = {
+            column for field in fields for column in cls.field_columns.get(field, (field,))
+        }
+        return tuple(column for column in cls.columns if column in needed)
+
+    @classmethod
+    def values(cls, queryset, fields=None, extra=()):
+        """
+        Narrow a Memory queryset to the columns this serializer reads.
+
+        `extra` adds columns needed by the caller rather than the output,
+        such as a paginator's sort key.
+        """
+        columns = cls.columns_for(fields)
+        return queryset.values(*columns, *(column for column in extra if column not in columns))
+
+    @property
+    def data(self):
+        tz = timezone.get_current_timezone()
+        rows = list(self.instance) if self.many else [self.instance]
+        variants = self.media_variants
+        if self.fields is None:
+            if variants is None:
+                variants = variants_for_urls(row['media_url'] for row in rows)
+            data = [self.to_representation(row, tz, variants) for row in rows]
+        else:
+            if variants is None and 'variants' in self.fields:
+                variants = variants_for_urls(row['media_url'] for row in rows)
+            data = [self.project(row, tz, variants, self.fields) for row in rows]
+        return data if self.many else data[0]
+
+    @staticmethod
+    def format_date(date, tz):
+        if date is not None:
+            # Same rendering as DRF's ISO 8601 DateTimeField.
+            if timezone.is_aware(date):
+                date = date.astimezone(tz)
+            date = date.isoformat()
+            if date.endswith('+00:00'):
+                date = date[:-6] + 'Z'
+        return date
+
+    @classmethod
+    def to_representation(cls, row, tz, variants):
+        return {
+            'id': str(row['id']),
+            'title': row['title'],
+            'caption': row['caption'],
+            'media_url': row['media_url'],
+            'variants': variants.get(row['media_url'], []),
+            'position': {
+                'x': row['position_x'],
+                'y': row['position_y'],
+                'z': row['position_z'],
+            },
+            'orbit_radius': row['orbit_radius'],
+            'is_featured': row['is_featured'],
+            'category': row['category'],
+            'date': cls.format_date(row['date'], tz),
+            'order': row['order'],
+        }
+
+    @classmethod
+    def project(cls, row, tz, variants, fields):
+        """Render only `fields` from a row holding just their columns."""
+        data = {}
+        for field in fields:
+            if field == 'id':
+                data['id'] = str(row['id'])
+            elif field == 'variants':
+                data['variants'] = variants.get(row['media_url'], [])
+            elif field == 'position':
+                data['position'] = {
+                    'x': row['position_x'],
+                    'y': row['position_y'],
+                    'z': row['position_z'],
+                }
+            elif field == 'date':
+                data['date'] = cls.format_date(row['date'], tz)
+            else:
+                data[field] = row[field]
+        return data
+
+
+class MemoryFieldsQuerySerializer(serializers.Serializer):
+    """
+    Level of detail for memory reads: a preset (lod) or a sparse fieldset.
+
+    `fields` is a comma-separated list of MemorySerializer fields and wins
+    over `lod`.  The id is always included so a memory can be fetched in
+    full later.  Validated data holds the output fields in MemorySerializer
+    order, or None for the full representation.
+    """
+    ALL_FIELDS = tuple(MemorySerializer.Meta.fields)
+    LODS = {
+        # Distant points in the universe: where to draw them and in what colour.
+        'far': ('id', 'position', 'category'),
+        # Close enough to show a thumbnail and a label.
+        'near': (
+            'id', 'title', 'variants', 'position', 'orbit_radius', 'is_featured', 'category'
+        ),
+        'full': ALL_FIELDS,
+    }
+
+    lod = serializers.ChoiceField(choices=list(LODS), default='full')
+    fields = serializers.CharField(
+        required=False, help_text="Comma-separated fields to return; overrides lod"
+    )
+
+    def validate_fields(self, value):
+        requested = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in requested if name not in self.ALL_FIELDS]
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown fields: {', '.join(unknown)}. "
+                f"Available: {', '.join(self.ALL_FIELDS)}"
+            )
+        return requested
+
+    def validate(self, attrs):
+        requested = attrs.get('fields') or self.LODS[attrs['lod']]
+        fields = tuple(
+            name for name in self.ALL_FIELDS if name == 'id' or name in requested
+        )
+        return {'fields': None if fields == self.ALL_FIELDS else fields}
+
+
 class MemoryCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer for creating and updating memories (admin only)."""
     position = PositionSerializer(required=False, help_text="3D position on unit sphere")
@@ -48,22 +233,18 @@ class MemoryCreateUpdateSerializer(serializers.ModelSerializer):
         """Handle nested position data."""
         position_data = validated_data.pop('position', None)
 
-        # Generate random position on sphere if not provided
+        # Generate an evenly spaced position on sphere if not provided
         if position_data:
             validated_data['position_x'] = position_data['x']
             validated_data['position_y'] = position_data['y']
             validated_data['position_z'] = position_data['z']
         else:
-            # Generate random position on unit sphere
-            import random
-            import math
-
-            theta = random.uniform(0, 2 * math.pi)  # azimuthal angle
-            phi = random.uniform(0, math.pi)       # polar angle
+            # Place on the unit sphere clear of existing memories
+            x, y, z = free_position()
 
-            validated_data['position_x'] = math.sin(phi) * math.cos(theta)
-            validated_data['position_y'] = math.sin(phi) * math.sin(theta)
-            validated_data['position_z'] = math.cos(phi)
+            validated_data['position_x'] = x
+            validated_data['position_y'] = y
+            validated_data['position_z'] = z
 
         return super().create(validated_data)
 
@@ -79,6 +260,71 @@ class MemoryCreateUpdateSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
+class SearchQuerySerializer(serializers.Serializer):
+    """Query parameters for full-text memory search."""
+    q = serializers.CharField(max_length=200, help_text="Words to find in titles and captions")
+    limit = serializers.IntegerField(default=20, min_value=1, max_value=100)
+    offset = serializers.IntegerField(default=0, min_value=0, max_value=10000)
+
+
+class MemoryChangesQuerySerializer(serializers.Serializer):
+    """Query parameters for delta sync."""
+    since = serializers.CharField(
+        required=False, help_text="Token from the previous sync; omit for a full sync"
+    )
+    limit = serializers.IntegerField(default=500, min_value=1, max_value=1000)
+
+    def validate_since(self, value):
+        """Decode the token into stream positions."""
+        try:
+            return decode_token(value)
+        except ValueError:
+            raise serializers.ValidationError("Invalid sync token")
+
+
+class MemoryBulkOperationSerializer(serializers.Serializer):
+    """One create, update or delete in a bulk memories request."""
+    OPERATIONS = ('create', 'update', 'delete')
+    MAX_OPERATIONS = 1000
+
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    id = serializers.UUIDField(required=False, help_text="Target memory for update and delete")
+    data = serializers.DictField(
+        required=False,
+        help_text="Memory fields, as accepted by MemoryCreateUpdateSerializer"
+    )
+
+    def validate(self, attrs):
+        """Require a target id for update/delete and data for create/update."""
+        op = attrs['op']
+        if op == 'create' and 'id' in attrs:
+            raise serializers.ValidationError({'id': "Ids are assigned on create"})
+        if op != 'create' and 'id' not in attrs:
+            raise serializers.ValidationError({'id': f"An id is required to {op} a memory"})
+        if op != 'delete' and 'data' not in attrs:
+            raise serializers.ValidationError({'data': f"Data is required to {op} a memory"})
+        return attrs
+
+
+class ViewportQuerySerializer(serializers.Serializer):
+    """Query parameters for a cone-shaped viewport lookup on the unit sphere."""
+    x = serializers.FloatField()
+    y = serializers.FloatField()
+    z = serializers.FloatField()
+    angle = serializers.FloatField(
+        default=30.0,
+        min_value=0.0,
+        max_value=180.0,
+        help_text="Cone half-angle in degrees"
+    )
+
+    def validate(self, attrs):
+        """Reject a zero-length view direction."""
+        if attrs['x'] == 0 and attrs['y'] == 0 and attrs['z'] == 0:
+            raise serializers.ValidationError("View direction must be non-zero")
+        return attrs
+
+
 class SiteSettingsSerializer(serializers.ModelSerializer):
     """Serializer for SiteSettings model."""
     theme_colors = serializers.DictField(read_only=True)
@@ -92,6 +338,33 @@ class SiteSettingsSerializer(serializers.ModelSerializer):
         ]
 
 
+# Upload extensions by media type, shared by every upload path.
+ALLOWED_EXTENSIONS = {
+    'image': ['jpg', 'jpeg', 'png'],
+    'video': ['mp4', 'webm'],
+    'audio': ['mp3', 'wav']
+}
+
+
+def media_type_for(filename):
+    """Return 'image', 'video' or 'audio' for an allowed filename, else None."""
+    file_extension = filename.split('.')[-1].lower()
+    for cat, extensions in ALLOWED_EXTENSIONS.items():
+        if file_extension in extensions:
+            return cat
+    return None
+
+
+def validate_media_filename(filename):
+    """Raise ValidationError unless the filename has an allowed extension."""
+    if not media_type_for(filename):
+        file_extension = filename.split('.')[-1].lower()
+        raise serializers.ValidationError(
+            f"File type .{file_extension} not allowed. "
+            f"Allowed types: {', '.join(sum(ALLOWED_EXTENSIONS.values(), []))}"
+        )
+
+
 class FileUploadSerializer(serializers.Serializer):
     """Serializer for file uploads."""
     file = serializers.FileField(
@@ -107,25 +380,30 @@ class FileUploadSerializer(serializers.Serializer):
             raise serializers.ValidationError("File size cannot exceed 10MB")
 
         # Check file extension
-        allowed_extensions = {
-            'image': ['jpg', 'jpeg', 'png'],
-            'video': ['mp4', 'webm'],
-            'audio': ['mp3', 'wav']
-        }
+        validate_media_filename(value.name)
 
-        file_extension = value.name.split('.')[-1].lower()
+        return value
 
-        # Find category based on extension
-        category = None
-        for cat, extensions in allowed_extensions.items():
-            if file_extension in extensions:
-                category = cat
-                break
 
-        if not category:
-            raise serializers.ValidationError(
-                f"File type .{file_extension} not allowed. "
-                f"Allowed types: {', '.join(sum(allowed_extensions.values(), []))}"
-            )
+class ChunkedUploadInitSerializer(serializers.Serializer):
+    """Serializer for starting a resumable chunked upload."""
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1, help_text="Total file size in bytes")
+    checksum = serializers.RegexField(
+        r'^[0-9a-fA-F]{64}$',
+        required=False,
+        allow_blank=True,
+        help_text="Optional SHA-256 (hex) of the whole file, verified on finalize"
+    )
+
+    def validate_filename(self, value):
+        """Only allow the same media types as direct uploads."""
+        validate_media_filename(value)
+        return value
 
-        return value
\ No newline at end of file
+    def validate_size(self, value):
+        """Enforce the configured upper bound for chunked uploads."""
+        limit = settings.CHUNKED_UPLOAD_MAX_SIZE
+        if value > limit:
+            raise serializers.ValidationError(f"File size cannot exceed {limit} bytes")
+        return value
@@ -0,0 +1,109 @@
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .blobs import adjust_references
+from .events import publish, publish_memories_changed
+from .manifest import schedule_build
+from .models import Memory, SiteSettings
+from .search import install_search_index
+from .serializers import MemorySerializer, SiteSettingsSerializer
+from .sync import record_tombstones
+from .versioning import MEMORIES, SETTINGS, bump_version
+
+
+@receiver([post_save, post_delete], sender=Memory)
+def memory_changed(sender, **kwargs):
+    """Bump the memories collection version and rebuild the manifest on any write."""
+    bump_version(MEMORIES)
+    schedule_build()
+
+
+def memories_changed_in_bulk():
+    """
+    What memory_changed and the change-stream handlers do, once for a whole
+    bulk write: bulk_create, bulk_update, update() and raw deletes send no
+    signals.  Call it inside the writing transaction.
+    """
+    bump_version(MEMORIES)
+    schedule_build()
+    publish_memories_changed()
+
+
+@receiver(post_save, sender=Memory)
+def memory_media_saved(sender, instance, created, **kwargs):
+    """Move a blob reference when a memory is created or its media_url changes."""
+    previous = None if created else getattr(instance, '_loaded_media_url', None)
+    if previous != instance.media_url:
+        if previous:
+            adjust_references(previous, -1)
+        adjust_references(instance.media_url, 1)
+    instance._loaded_media_url = instance.media_url
+
+
+@receiver(post_delete, sender=Memory)
+def memory_media_deleted(sender, instance, **kwargs):
+    """Release the deleted memory's blob reference."""
+    adjust_references(getattr(instance, '_loaded_media_url', instance.media_url), -1)
+
+
+@receiver(post_delete, sender=Memory)
+def memory_deleted(sender, instance, **kwargs):
+    """Leave a tombstone so delta sync can report the deletion."""
+    record_tombstones([instance.pk])
+
+
+@receiver(post_save, sender=Memory)
+def memory_saved_event(sender, instance, created, **kwargs):
+    """Push the saved memory to the change stream."""
+    publish({
+        'type': 'memory',
+        'action': 'created' if created else 'updated',
+        'id': str(instance.pk),
+        'secret': instance.is_secret,
+        'memory': MemorySerializer(instance).data,
+    })
+
+
+@receiver(post_delete, sender=Memory)
+def memory_deleted_event(sender, instance, **kwargs):
+    """Push the deletion to the change stream."""
+    publish({
+        'type': 'memory',
+        'action': 'deleted',
+        'id': str(instance.pk),
+        'secret': instance.is_secret,
+    })
+
+
+@receiver([post_save, post_delete], sender=SiteSettings)
+def site_settings_changed(sender, **kwargs):
+    """Bump the settings version and rebuild the manifest on any write."""
+    bump_version(SETTINGS)
+    schedule_build()
+
+
+@receiver([post_save, post_delete], sender=SiteSettings)
+def site_settings_event(sender, **kwargs):
+    """Push the current settings to the change stream."""
+    publish({
+        'type': 'settings',
+        'action': 'updated',
+        'settings': SiteSettingsSerializer(SiteSettings.load()).data,
+    })
+
+
+@receiver(post_migrate)
+def create_default_site_settings(sender, using='default', **kwargs):
+    """Create the settings singleton after migrating, so requests never have to."""
+    if sender.name != 'memories':
+        return
+    if not SiteSettings.objects.using(using).exists():
+        SiteSettings().save(using=using)
+
+
+@receiver(post_migrate)
+def create_search_index(sender, using='default', **kwargs):
+    """Install (or repair) the full-text index on memory titles and captions."""
+    if sender.name != 'memories':
+        return
+    install_search_index(using)
\ No newline at end of file
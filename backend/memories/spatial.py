@@ -0,0 +1,180 @@
+"""
+Cube-face quadtree cells for positions on the unit sphere.
+
+Each point is projected onto the face of the enclosing cube that its largest
+component points at, and the face is recursively split into quadrants.  A
+cell id packs the face number above the Morton-interleaved (i, j) quadrant
+path, so every cell at a coarser level owns one contiguous range of leaf ids
+and a spherical cap can be covered by a handful of integer BETWEEN ranges.
+"""
+import math
+
+import numpy as np
+
+# Leaf level of the stored cell ids: 6 * 4**12 cells, roughly 0.02 degrees wide.
+SPATIAL_LEVEL = 12
+
+FACE_COUNT = 6
+
+# Face number -> (major axis, sign); faces 0-2 are +x/+y/+z, 3-5 are -x/-y/-z.
+_FACES = [(0, 1.0), (1, 1.0), (2, 1.0), (0, -1.0), (1, -1.0), (2, -1.0)]
+
+
+def _interleave(i, j):
+    """Morton-interleave two quadrant coordinates, i on the odd bits."""
+    code = 0
+    bit = 0
+    while i or j:
+        code |= (i & 1) << (2 * bit + 1)
+        code |= (j & 1) << (2 * bit)
+        i >>= 1
+        j >>= 1
+        bit += 1
+    return code
+
+
+def _face_uv(x, y, z):
+    """Project a vector onto its cube face, returning (face, u, v) in [-1, 1]."""
+    coords = (x, y, z)
+    axis = max(range(3), key=lambda k: abs(coords[k]))
+    major = coords[axis]
+    face = axis if major >= 0 else axis + 3
+    a, b = [coords[k] for k in range(3) if k != axis]
+    scale = abs(major)
+    return face, a / scale, b / scale
+
+
+def _uv_to_xyz(face, u, v):
+    """Unit vector for a point (u, v) on a cube face."""
+    axis, sign = _FACES[face]
+    coords = [0.0, 0.0, 0.0]
+    coords[axis] = sign
+    others = [k for k in range(3) if k != axis]
+    coords[others[0]] = u
+    coords[others[1]] = v
+    norm = math.sqrt(coords[0] ** 2 + coords[1] ** 2 + coords[2] ** 2)
+    return coords[0] / norm, coords[1] / norm, coords[2] / norm
+
+
+def cell_for_point(x, y, z, level=SPATIAL_LEVEL):
+    """Return the leaf cell id containing the direction (x, y, z)."""
+    if x == 0 and y == 0 and z == 0:
+        return 0
+
+    face, u, v = _face_uv(x, y, z)
+    size = 1 << level
+    i = min(int((u + 1.0) * 0.5 * size), size - 1)
+    j = min(int((v + 1.0) * 0.5 * size), size - 1)
+    return (face << (2 * level)) | _interleave(i, j)
+
+
+def _spread_bits(values):
+    """Insert a zero bit above every bit of each value (vectorised _interleave half)."""
+    values = values.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF),
+                        (4, 0x0F0F0F0F0F0F0F0F), (2, 0x3333333333333333),
+                        (1, 0x5555555555555555)):
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
+
+
+def cells_for_points(points, level=SPATIAL_LEVEL):
+    """Vectorised cell_for_point over an (N, 3) array, returning int64 ids."""
+    points = np.asarray(points, dtype=np.float64)
+    axis = np.argmax(np.abs(points), axis=1)
+    rows = np.arange(len(points))
+    major = points[rows, axis]
+    others = np.array([[1, 2], [0, 2], [0, 1]])[axis]
+    scale = np.abs(major)
+    zero = scale == 0
+    scale[zero] = 1.0
+    u = points[rows, others[:, 0]] / scale
+    v = points[rows, others[:, 1]] / scale
+
+    size = 1 << level
+    i = np.minimum(((u + 1.0) * 0.5 * size).astype(np.int64), size - 1)
+    j = np.minimum(((v + 1.0) * 0.5 * size).astype(np.int64), size - 1)
+    face = np.where(major >= 0, axis, axis + 3).astype(np.uint64)
+    cells = (face << np.uint64(2 * level)) | (_spread_bits(i) << np.uint64(1)) | _spread_bits(j)
+    cells = cells.astype(np.int64)
+    cells[zero] = 0
+    return cells
+
+
+def cell_range(face, code, cell_level, level=SPATIAL_LEVEL):
+    """Inclusive range of leaf ids below the cell `code` at `cell_level`."""
+    shift = 2 * (level - cell_level)
+    low = (face << (2 * level)) | (code << shift)
+    return low, low + (1 << shift) - 1
+
+
+def _angle(a, b):
+    dot = a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+    return math.acos(max(-1.0, min(1.0, dot)))
+
+
+def _cell_cap(face, i, j, cell_level):
+    """Centre and angular radius of the cap bounding a cell."""
+    size = 1 << cell_level
+    u0 = 2.0 * i / size - 1.0
+    v0 = 2.0 * j / size - 1.0
+    step = 2.0 / size
+    centre = _uv_to_xyz(face, u0 + step / 2, v0 + step / 2)
+    # Cell edges are great-circle arcs, so the farthest point is a corner.
+    radius = max(
+        _angle(centre, _uv_to_xyz(face, u0 + du * step, v0 + dv * step))
+        for du in (0, 1) for dv in (0, 1)
+    )
+    return centre, radius
+
+
+def cover_level_for_angle(angle, level=SPATIAL_LEVEL):
+    """Coarsest level whose cells are small relative to a cone of half-angle `angle`."""
+    target = max(angle, 1e-6) / 4
+    cover = 0
+    while cover < level and (math.pi / 2) / (1 << cover) > target:
+        cover += 1
+    return cover
+
+
+def cover_cone(direction, angle, level=SPATIAL_LEVEL, max_level=None):
+    """
+    Cover a spherical cap with merged, inclusive ranges of leaf cell ids.
+
+    `direction` is the cap axis and `angle` its half-angle in radians.  The
+    cover is conservative: it contains every cell intersecting the cap, so
+    callers refine candidates with an exact angular test.
+    """
+    norm = math.sqrt(sum(c * c for c in direction))
+    if norm == 0:
+        raise ValueError("View direction must be non-zero")
+    axis = tuple(c / norm for c in direction)
+    if max_level is None:
+        max_level = cover_level_for_angle(angle, level)
+
+    ranges = []
+    stack = [(face, 0, 0, 0) for face in reversed(range(FACE_COUNT))]
+    while stack:
+        face, i, j, cell_level = stack.pop()
+        centre, radius = _cell_cap(face, i, j, cell_level)
+        distance = _angle(axis, centre)
+        if distance > angle + radius:
+            continue
+        if distance + radius <= angle or cell_level >= max_level:
+            ranges.append(cell_range(face, _interleave(i, j), cell_level, level))
+            continue
+        for di, dj in ((1, 1), (1, 0), (0, 1), (0, 0)):
+            stack.append((face, 2 * i + di, 2 * j + dj, cell_level + 1))
+
+    return merge_ranges(ranges)
+
+
+def merge_ranges(ranges):
+    """Sort inclusive ranges and coalesce overlapping or adjacent ones."""
+    merged = []
+    for low, high in sorted(ranges):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+    return merged
\ No newline at end of file
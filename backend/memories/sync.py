@@ -0,0 +1,144 @@
+"""
+Delta sync: memories changed and deleted since a client's last sync token.
+
+Changes are read in (updated_at, id) order from Memory and deletions in
+(deleted_at, id) order from MemoryTombstone, each as its own keyset stream.
+The token records how far the client has read in both, so a poll costs a
+range seek on each index and returns only what changed.
+
+Rows are only served up to a horizon MEMORY_SYNC_SETTLE seconds in the
+past.  updated_at is stamped before the writing transaction commits, so a
+row can become visible with a timestamp older than rows a client has
+already seen; holding the horizon back means a transaction that commits
+within the settle window is never skipped.
+
+Tombstones are kept for MEMORY_TOMBSTONE_RETENTION_DAYS.  Older tokens may
+have missed deletions that were since pruned, so they are refused and the
+client starts over without a token.
+"""
+import base64
+import json
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Memory, MemoryTombstone
+
+
+class TokenExpired(Exception):
+    """The token predates the tombstone retention window."""
+
+
+def encode_token(position):
+    """Opaque token for {'u': [time, id], 'd': [time, id]} stream positions."""
+    payload = {
+        stream: [moment.isoformat(), None if pk is None else str(pk)]
+        for stream, (moment, pk) in position.items()
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_token(token):
+    """Inverse of encode_token; raises ValueError for anything malformed."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        position = {}
+        for stream, parse_pk in (('u', uuid.UUID), ('d', int)):
+            moment, pk = payload[stream]
+            moment = parse_datetime(moment)
+            if moment is None or timezone.is_naive(moment):
+                raise ValueError(moment)
+            position[stream] = (moment, None if pk is None else parse_pk(pk))
+        return position
+    except (TypeError, KeyError, UnicodeEncodeError) as exc:
+        raise ValueError(str(exc)) from exc
+
+
+def after(time_field, pk_field, moment, pk):
+    """Rows strictly after (moment, pk); pk None means after everything at moment."""
+    if pk is None:
+        return Q(**{f'{time_field}__gt': moment})
+    return Q(**{f'{time_field}__gte': moment}) & (
+        Q(**{f'{time_field}__gt': moment}) | Q(**{time_field: moment, f'{pk_field}__gt': pk})
+    )
+
+
+def read_stream(queryset, time_field, pk_field, start, horizon, limit):
+    """
+    Up to `limit` rows after `start` and no later than `horizon`, plus the new
+    stream position and whether rows were left over.
+    """
+    if start is not None:
+        queryset = queryset.filter(after(time_field, pk_field, *start))
+    rows = list(
+        queryset.filter(**{f'{time_field}__lte': horizon}).order_by(time_field, pk_field)[:limit + 1]
+    )
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, (last[time_field], last[pk_field]), True
+    # Everything up to the horizon has been read.
+    return rows, (horizon, None), False
+
+
+def changes_since(position, limit, columns, include_secret):
+    """
+    Memories changed and ids deleted since `position` (None for a full sync).
+
+    Returns (rows, deleted_ids, next_position, has_more).  Without
+    include_secret, memories that are now secret are left out of a full sync
+    and reported as deleted by later ones, since a public client may hold
+    them from before they were hidden.
+    """
+    now = timezone.now()
+    horizon = now - timedelta(seconds=settings.MEMORY_SYNC_SETTLE)
+    if position is not None:
+        # Only the deletions stream can lose rows to pruning; the changes
+        # stream of a first sync legitimately starts at old updated_at values.
+        retained = now - timedelta(days=settings.MEMORY_TOMBSTONE_RETENTION_DAYS)
+        if position['d'][0] < retained:
+            raise TokenExpired()
+
+    extra = [column for column in ('updated_at', 'id', 'is_secret') if column not in columns]
+    memories = Memory.objects.values(*columns, *extra)
+    rows, updated_to, more_rows = read_stream(
+        memories, 'updated_at', 'id', position and position['u'], horizon, limit
+    )
+
+    deleted = []
+    if position is not None:
+        # On a full sync there is nothing held yet to delete.
+        tombstones = MemoryTombstone.objects.values('id', 'memory_id', 'deleted_at')
+        stones, deleted_to, more_stones = read_stream(
+            tombstones, 'deleted_at', 'id', position['d'], horizon, limit
+        )
+        deleted = [str(stone['memory_id']) for stone in stones]
+    else:
+        deleted_to, more_stones = (horizon, None), False
+
+    if not include_secret:
+        if position is not None:
+            deleted += [str(row['id']) for row in rows if row['is_secret']]
+        rows = [row for row in rows if not row['is_secret']]
+
+    return rows, deleted, {'u': updated_to, 'd': deleted_to}, more_rows or more_stones
+
+
+def record_tombstones(memory_ids, deleted_at=None):
+    """Remember deleted memories for delta sync."""
+    deleted_at = deleted_at or timezone.now()
+    MemoryTombstone.objects.bulk_create(
+        MemoryTombstone(memory_id=pk, deleted_at=deleted_at) for pk in memory_ids
+    )
+
+
+def prune_tombstones():
+    """Delete tombstones past the retention window; returns how many."""
+    cutoff = timezone.now() - timedelta(days=settings.MEMORY_TOMBSTONE_RETENTION_DAYS)
+    deleted, _ = MemoryTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
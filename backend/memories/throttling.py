@@ -0,0 +1,137 @@
+"""
+Token-bucket rate limits for the public and login endpoints.
+
+A view names its scope with throttle_scope (function views use
+scoped_throttle()), and THROTTLE_BUCKETS gives each scope a (rate, burst):
+the bucket holds `burst` tokens, refills at `rate`, and every request takes
+one.  Each client has its own bucket per scope: signed-in users by account,
+everyone else by IP address (REST_FRAMEWORK NUM_PROXIES says how many
+proxies' X-Forwarded-For entries to trust).  A request that finds its bucket
+empty is answered 429 with Retry-After, the seconds until a token is back.
+
+A bucket is stored as a single number, the time at which it will be full
+again (the GCRA form of a token bucket), in the THROTTLE_CACHE_ALIAS cache,
+and the entry expires at that time.  With Django's RedisCache the
+check-and-take runs as one Lua script, so it is atomic across every worker
+and host.  Other caches have no atomic read-modify-write, so there it runs
+under a lock in this process: exact for LocMemCache, which gives every worker
+its own buckets, while on a cache shared by several workers two of them
+racing on one bucket can both let a request through.
+bench_throttle measures the cost of a check.
+"""
+import math
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+CACHE_PREFIX = 'throttle'
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Waits shorter than this are rounding error: times near the Unix epoch's
+# current magnitude carry about 0.2 microseconds of float precision.
+EPSILON = 1e-6
+
+# KEYS[1] the bucket; ARGV now, interval, capacity (all seconds).  Returns
+# the wait as a string, since Redis truncates Lua numbers to integers.
+TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local capacity = tonumber(ARGV[3])
+local full_at = tonumber(redis.call('GET', KEYS[1]) or ARGV[1])
+if full_at < now then full_at = now end
+full_at = full_at + interval
+local wait = full_at - now - capacity
+if wait > 0.000001 then return tostring(wait) end  -- EPSILON
+redis.call('SET', KEYS[1], tostring(full_at), 'PX', math.ceil((full_at - now) * 1000))
+return '0'
+"""
+
+_lock = threading.Lock()
+_scripts = {}
+
+
+@lru_cache(maxsize=None)
+def bucket_shape(rate, burst):
+    """
+    (seconds per token, seconds of tokens the bucket holds) for a rate such
+    as '10/s' or '5/min' (DRF's format) and a burst in requests.
+    """
+    try:
+        count, period = rate.split('/')
+        interval = PERIODS[period[0]] / int(count)
+    except (ValueError, KeyError, IndexError, ZeroDivisionError):
+        raise ImproperlyConfigured(f'Invalid throttle rate {rate!r}')
+    if burst < 1:
+        raise ImproperlyConfigured(f'Throttle burst must be at least 1, not {burst!r}')
+    return interval, interval * burst
+
+
+def _take_redis(cache, key, now, interval, capacity):
+    key = cache.make_and_validate_key(key)
+    client = cache._cache.get_client(key, write=True)
+    script = _scripts.get(settings.THROTTLE_CACHE_ALIAS)
+    if script is None:
+        script = _scripts[settings.THROTTLE_CACHE_ALIAS] = client.register_script(TAKE_SCRIPT)
+    return float(script(keys=[key], args=[repr(now), repr(interval), repr(capacity)], client=client))
+
+
+def take(key, interval, capacity, now=None):
+    """
+    Take a token from bucket `key`.  Returns 0 when there was one, otherwise
+    the seconds until there will be.
+    """
+    if now is None:
+        now = time.time()
+    cache = caches[settings.THROTTLE_CACHE_ALIAS]
+    if isinstance(cache, RedisCache):
+        return _take_redis(cache, key, now, interval, capacity)
+    with _lock:
+        full_at = max(cache.get(key, now), now) + interval
+        wait = full_at - now - capacity
+        if wait > EPSILON:
+            return wait
+        # Whole seconds: memcached would expire a sub-second timeout at once.
+        cache.set(key, full_at, math.ceil(full_at - now))
+        return 0
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttle the view's throttle_scope with a token bucket per client."""
+
+    scope = None
+
+    def allow_request(self, request, view):
+        scope = self.scope or getattr(view, 'throttle_scope', None)
+        if scope is None:
+            return True
+        try:
+            rate, burst = settings.THROTTLE_BUCKETS[scope]
+        except KeyError:
+            raise ImproperlyConfigured(f'No THROTTLE_BUCKETS entry for scope {scope!r}')
+        interval, capacity = bucket_shape(rate, burst)
+
+        user = request.user
+        if user is not None and user.is_authenticated:
+            client = f'user:{user.pk}'
+        else:
+            client = f'ip:{self.get_ident(request)}'
+        self.delay = take(f'{CACHE_PREFIX}:{scope}:{client}', interval, capacity)
+        return self.delay == 0
+
+    def wait(self):
+        return self.delay
+
+
+def scoped_throttle(scope):
+    """
+    A TokenBucketThrottle for `scope`, for function views, which cannot set
+    throttle_scope:  @throttle_classes([scoped_throttle('admin-login')])
+    """
+    return type('TokenBucketThrottle', (TokenBucketThrottle,), {'scope': scope})
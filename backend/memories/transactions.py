@@ -0,0 +1,48 @@
+"""
+Commit hooks that run once per transaction, however many writes ask for them.
+
+Row signals fire for every saved memory and each asks for the same follow-up
+after commit (a manifest rebuild, a change event).  on_commit_once records
+which callbacks this thread has registered with the open transaction, and a
+callback clears its entry when it runs.  A rolled-back transaction never runs
+its callbacks, so the record is also cleared whenever no transaction is open
+and at the start of every request.
+"""
+import threading
+
+from django.core.signals import request_started
+from django.db import connection, transaction
+from django.dispatch import receiver
+
+_local = threading.local()
+
+
+def _registered():
+    registered = getattr(_local, 'registered', None)
+    if registered is None:
+        registered = _local.registered = set()
+    return registered
+
+
+@receiver(request_started)
+def _forget_registered(**kwargs):
+    _registered().clear()
+
+
+def on_commit_once(func):
+    """transaction.on_commit(func), unless func already waits on this transaction."""
+    registered = _registered()
+    if not connection.in_atomic_block:
+        # No transaction is open: anything recorded belonged to one that ended.
+        registered.clear()
+        func()
+        return
+    if func in registered:
+        return
+    registered.add(func)
+
+    def run():
+        registered.discard(func)
+        func()
+
+    transaction.on_commit(run)
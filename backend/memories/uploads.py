@@ -0,0 +1,170 @@
+"""
+Resumable chunked uploads streamed straight to disk.
+
+A session's bytes accumulate in a part file under CHUNKED_UPLOAD_DIR, and the
+part file's length is the authoritative upload offset, so writing a chunk
+needs no database update.  Chunks are streamed from the request in small
+blocks while being hashed, and a chunk whose SHA-256 does not match is cut
+back off the file.  Finalizing hashes the part file and hands it to content-
+addressed blob storage, a rename when both live on the same filesystem.
+Sessions expire CHUNKED_UPLOAD_EXPIRY_HOURS after they start; run
+prune_upload_sessions periodically to remove abandoned ones.
+"""
+import hashlib
+import mimetypes
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .blobs import adopt_file
+from .models import UploadSession
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+BLOCK_SIZE = 64 * 1024
+
+
+class ChunkError(Exception):
+    """A chunk or finalize request that cannot be applied at the current offset."""
+
+    def __init__(self, message, status_code, offset=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.offset = offset
+
+
+def part_path(session):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{session.pk}.part')
+
+
+def start(session):
+    """Create the empty part file for a new session."""
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    open(part_path(session), 'xb').close()
+
+
+def current_offset(session):
+    """Bytes received so far, or None if the part file is gone."""
+    try:
+        return os.path.getsize(part_path(session))
+    except FileNotFoundError:
+        return None
+
+
+def write_chunk(session, offset, stream, length, sha256):
+    """
+    Append `length` bytes from `stream` at `offset`, returning the new offset.
+
+    The chunk must start exactly at the current end of the part file and its
+    SHA-256 must equal `sha256`; otherwise nothing is kept and ChunkError
+    carries the offset the client should resume from.
+    """
+    try:
+        part = open(part_path(session), 'r+b')
+    except FileNotFoundError:
+        raise ChunkError('Upload not found', 404)
+
+    with part:
+        _lock(part)
+        received = os.fstat(part.fileno()).st_size
+        if offset != received:
+            raise ChunkError('Offset does not match bytes received', 409, received)
+        if received + length > session.size:
+            raise ChunkError('Chunk runs past the declared file size', 400, received)
+
+        digest = hashlib.sha256()
+        remaining = length
+        part.seek(received)
+        try:
+            while remaining:
+                block = stream.read(min(BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                digest.update(block)
+                part.write(block)
+                remaining -= len(block)
+            if remaining:
+                raise ChunkError('Chunk body shorter than Content-Length', 400, received)
+            if digest.hexdigest() != sha256.lower():
+                raise ChunkError('Chunk checksum mismatch', 400, received)
+        except BaseException:
+            part.truncate(received)
+            raise
+        return received + length
+
+
+def finalize(session):
+    """
+    Verify a complete part file and move it into content-addressed storage.
+
+    Returns (MediaBlob, created, content type).  The part file is consumed;
+    if the same bytes are already stored it is simply discarded.
+    """
+    path = part_path(session)
+    received = current_offset(session)
+    if received is None:
+        raise ChunkError('Upload not found', 404)
+    if received != session.size:
+        raise ChunkError('Upload is incomplete', 409, received)
+    digest = _file_sha256(path)
+    if session.checksum and digest != session.checksum.lower():
+        raise ChunkError('File checksum mismatch', 400, received)
+
+    file_extension = session.filename.split('.')[-1].lower()
+    blob, created = adopt_file(path, digest, file_extension)
+    content_type = mimetypes.guess_type(session.filename)[0] or 'application/octet-stream'
+    return blob, created, content_type
+
+
+def discard(session):
+    """Remove a session's part file if present."""
+    try:
+        os.unlink(part_path(session))
+    except FileNotFoundError:
+        pass
+
+
+def expiry_cutoff():
+    """Sessions created before this have expired."""
+    return timezone.now() - timedelta(hours=settings.CHUNKED_UPLOAD_EXPIRY_HOURS)
+
+
+def expired(session):
+    return session.created_at < expiry_cutoff()
+
+
+def prune_sessions(batch_size=500):
+    """Delete expired sessions and their part files; returns how many."""
+    stale = UploadSession.objects.filter(created_at__lt=expiry_cutoff()).order_by('pk')
+    pruned = 0
+    while True:
+        batch = list(stale[:batch_size])
+        if not batch:
+            return pruned
+        for session in batch:
+            discard(session)
+        UploadSession.objects.filter(pk__in=[session.pk for session in batch]).delete()
+        pruned += len(batch)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as part:
+        for block in iter(lambda: part.read(BLOCK_SIZE * 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _lock(part):
+    if fcntl is None:
+        return
+    try:
+        fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        raise ChunkError('Another chunk is being written to this upload', 409)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import events, metrics, views
 
 # Create router for ViewSet
 router = DefaultRouter()
@@ -9,11 +9,21 @@ router.register(r'memories', views.MemoryViewSet)
 app_name = 'memories'
 
 urlpatterns = [
-    # Include ViewSet URLs
-    path('', include(router.urls)),
-
-    # Custom API endpoints
+    # Custom API endpoints (listed first so memories/<pk>/ does not shadow them)
     path('settings/', views.site_settings, name='site-settings'),
+    path('universe/manifest', views.universe_manifest, name='universe-manifest'),
+    path('metrics', metrics.metrics, name='metrics'),
+    path('events/', events.event_stream, name='event-stream'),
     path('memories/upload/', views.upload_file, name='file-upload'),
+    path('memories/uploads/', views.chunked_upload_init, name='chunked-upload-init'),
+    path('memories/uploads/<uuid:upload_id>/', views.chunked_upload, name='chunked-upload'),
+    path(
+        'memories/uploads/<uuid:upload_id>/finalize/',
+        views.chunked_upload_finalize,
+        name='chunked-upload-finalize'
+    ),
     path('auth/secret-reveal/', views.reveal_secret, name='reveal-secret'),
+
+    # Include ViewSet URLs
+    path('', include(router.urls)),
 ]
\ No newline at end of file
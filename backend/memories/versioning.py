@@ -0,0 +1,52 @@
+"""
+Collection versions and the conditional-GET support built on them.
+
+Each served collection has a counter in CollectionVersion that is bumped on
+every write, so an ETag can be derived from the counter alone and a matching
+If-None-Match is answered with 304 before the view queries any memories.
+"""
+import hashlib
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.views.decorators.http import condition
+
+from .models import CollectionVersion
+
+MEMORIES = 'memories'
+SETTINGS = 'settings'
+
+
+def bump_version(name):
+    """Atomically increment a collection's version, creating it on first use."""
+    if CollectionVersion.objects.filter(name=name).update(version=F('version') + 1):
+        return
+    try:
+        with transaction.atomic():
+            CollectionVersion.objects.create(name=name, version=1)
+    except IntegrityError:
+        # Another writer created the row first; count this write on top of it.
+        CollectionVersion.objects.filter(name=name).update(version=F('version') + 1)
+
+
+def get_versions(*names):
+    """Return the current versions of the named collections, 0 if never written."""
+    versions = dict(
+        CollectionVersion.objects.filter(name__in=names).values_list('name', 'version')
+    )
+    return [versions.get(name, 0) for name in names]
+
+
+def collection_etag(request, *names):
+    """Strong ETag for a GET on the named collections as seen by this request."""
+    versions = '.'.join(str(version) for version in get_versions(*names))
+    scope = 'auth' if request.user.is_authenticated else 'public'
+    digest = hashlib.sha1(
+        f'{scope}|{request.get_full_path()}'.encode('utf-8')
+    ).hexdigest()[:16]
+    return f'"{"+".join(names)}-{versions}-{digest}"'
+
+
+def versioned(*names):
+    """View decorator adding a collection-version ETag and If-None-Match handling."""
+    return condition(etag_func=lambda request, *args, **kwargs: collection_etag(request, *names))
@@ -1,23 +1,47 @@
+import math
 import os
-import uuid
+from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import condition, require_http_methods
 from django.contrib.auth.decorators import login_required
-from django.core.files.storage import default_storage
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.utils.functional import cached_property
 from django.core.files.base import ContentFile
-from django.db.models import Q
+from django.db.models import F, Q
+from django.db.models.functions import Sqrt
 from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.decorators import (
+    action, api_view, parser_classes, permission_classes, throttle_classes
+)
+from rest_framework.permissions import (
+    SAFE_METHODS, IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
+)
 from rest_framework.response import Response
-from rest_framework.parsers import MultiPartParser, FormParser
-from .models import Memory, SiteSettings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
+from .blobs import store_upload, uploaded_digest
+from .buffers import get_position_bundle
+from .bulk import run_operations
+from .derivatives import schedule_derivatives
+from .manifest import open_variant
+from . import uploads
+from .models import MediaAsset, Memory, SiteSettings, UploadSession
+from .pagination import MemoryCursorPagination
 from .serializers import (
-    MemorySerializer, MemoryCreateUpdateSerializer,
-    SiteSettingsSerializer, FileUploadSerializer
+    MemorySerializer, MemoryCreateUpdateSerializer, MemoryValuesSerializer,
+    MemoryBulkOperationSerializer, MemoryChangesQuerySerializer, MemoryFieldsQuerySerializer,
+    SearchQuerySerializer,
+    SiteSettingsSerializer, FileUploadSerializer, ViewportQuerySerializer,
+    ChunkedUploadInitSerializer
 )
+from .search import search_memories
+from .spatial import cover_cone
+from .sync import TokenExpired, changes_since, encode_token
+from .throttling import scoped_throttle
+from .versioning import MEMORIES, versioned
 
 
 class MemoryViewSet(viewsets.ModelViewSet):
@@ -27,6 +51,15 @@ class MemoryViewSet(viewsets.ModelViewSet):
     serializer_class = MemorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     parser_classes = [MultiPartParser, FormParser]
+    pagination_class = MemoryCursorPagination
+    # Let pages come straight off an ordering index; actions with a selective
+    # filter turn this off so the filter's index drives the query.
+    ordering_from_index = True
+
+    @property
+    def throttle_scope(self):
+        """Reads are public and throttled; writes need staff and are not."""
+        return 'memories' if self.request.method in SAFE_METHODS else None
 
     def get_serializer_class(self):
         """Return appropriate serializer based on action."""
@@ -37,42 +70,270 @@ class MemoryViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Filter out secret memories for public access."""
         if self.request.user.is_authenticated:
-            return Memory.objects.all()
-        return Memory.objects.filter(is_secret=False)
+            queryset = Memory.objects.all()
+        else:
+            queryset = Memory.objects.filter(is_secret=False)
+        if self.action == 'retrieve' and self.read_fields is not None:
+            queryset = queryset.only(*MemoryValuesSerializer.columns_for(self.read_fields))
+        return queryset
+
+    @cached_property
+    def read_fields(self):
+        """Output fields picked by the lod/fields query parameters, None for all."""
+        params = MemoryFieldsQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        return params.validated_data['fields']
+
+    @method_decorator(versioned(MEMORIES))
+    def list(self, request, *args, **kwargs):
+        """List memories one keyset page at a time."""
+        return self.paginated_response(self.filter_queryset(self.get_queryset()))
+
+    @method_decorator(versioned(MEMORIES))
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve one memory, answering If-None-Match from the collection version."""
+        serializer = self.get_serializer(self.get_object(), fields=self.read_fields)
+        return Response(serializer.data)
 
     def perform_create(self, serializer):
         """Set created_by when creating memories."""
         serializer.save()
 
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    @method_decorator(versioned(MEMORIES))
     def featured(self, request):
         """Get featured memories only."""
         featured_memories = self.get_queryset().filter(is_featured=True)
-        serializer = self.get_serializer(featured_memories, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(featured_memories)
 
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    @method_decorator(versioned(MEMORIES))
     def category(self, request):
         """Filter memories by category."""
         category = request.query_params.get('type', 'PHOTO')
         memories = self.get_queryset().filter(category=category.upper())
-        serializer = self.get_serializer(memories, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(memories)
+
+    @action(
+        detail=False, methods=['get'], permission_classes=[AllowAny], ordering_from_index=False
+    )
+    @method_decorator(versioned(MEMORIES))
+    def viewport(self, request):
+        """Memories whose direction lies inside a view cone (x, y, z, angle)."""
+        params = ViewportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        x, y, z = (params.validated_data[axis] for axis in ('x', 'y', 'z'))
+        angle = math.radians(params.validated_data['angle'])
+
+        # Seek the spatial_cell index with the cone's cell cover, then apply
+        # the exact angular test to the surviving candidates.
+        cover = Q()
+        for low, high in cover_cone((x, y, z), angle):
+            cover |= Q(spatial_cell__range=(low, high))
+
+        norm = math.sqrt(x * x + y * y + z * z)
+        dot = (F('position_x') * (x / norm) + F('position_y') * (y / norm)
+               + F('position_z') * (z / norm))
+        magnitude = Sqrt(F('position_x') * F('position_x') + F('position_y') * F('position_y')
+                         + F('position_z') * F('position_z'))
+        memories = self.get_queryset().filter(cover).alias(
+            view_dot=dot, view_magnitude=magnitude
+        ).filter(view_dot__gte=F('view_magnitude') * math.cos(angle))
+        return self.paginated_response(memories)
+
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    @method_decorator(versioned(MEMORIES))
+    def search(self, request):
+        """Full-text search over titles and captions, best match first (q, limit, offset)."""
+        params = SearchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        limit, offset = params.validated_data['limit'], params.validated_data['offset']
+
+        matches = search_memories(self.get_queryset(), params.validated_data['q'])
+        # One extra row tells whether another page exists without a COUNT.
+        rows = list(
+            MemoryValuesSerializer.values(matches, self.read_fields)[offset:offset + limit + 1]
+        )
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+
+        url = request.build_absolute_uri()
+        next_url = replace_query_param(url, 'offset', offset + limit) if has_next else None
+        previous_url = None
+        if offset:
+            previous_url = (
+                replace_query_param(url, 'offset', offset - limit) if offset > limit
+                else remove_query_param(url, 'offset')
+            )
+        return Response({
+            'next': next_url,
+            'previous': previous_url,
+            'results': MemoryValuesSerializer(rows, many=True, fields=self.read_fields).data
+        })
+
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    def changes(self, request):
+        """
+        Memories changed and deleted since a sync token (since, limit).
+
+        Without `since` every memory is returned.  Keep calling with the
+        returned token while has_more is true; afterwards poll with it.
+        Honours lod/fields for the changed memories.
+        """
+        params = MemoryChangesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        try:
+            rows, deleted, position, has_more = changes_since(
+                params.validated_data.get('since'),
+                params.validated_data['limit'],
+                MemoryValuesSerializer.columns_for(self.read_fields),
+                include_secret=request.user.is_authenticated,
+            )
+        except TokenExpired:
+            return Response({
+                'success': False,
+                'error': 'Sync token expired; sync again without since'
+            }, status=status.HTTP_410_GONE)
+
+        return Response({
+            'token': encode_token(position),
+            'has_more': has_more,
+            'updated': MemoryValuesSerializer(rows, many=True, fields=self.read_fields).data,
+            'deleted': deleted,
+        })
+
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    @method_decorator(versioned(MEMORIES))
+    def positions(self, request):
+        """Public memory positions as packed little-endian Float32 (x, y, z, orbit_radius)."""
+        bundle = get_position_bundle()
+        response = HttpResponse(bundle.buffer, content_type='application/octet-stream')
+        response.headers['X-Collection-Version'] = str(bundle.version)
+        response.headers['X-Memory-Count'] = str(bundle.count)
+        return response
+
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny], url_path='positions/ids')
+    @method_decorator(versioned(MEMORIES))
+    def position_ids(self, request):
+        """Memory ids in the same order as the records of the positions buffer."""
+        bundle = get_position_bundle()
+        response = HttpResponse(bundle.index, content_type='application/json')
+        response.headers['X-Collection-Version'] = str(bundle.version)
+        return response
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser])
+    def bulk(self, request):
+        """
+        Apply a JSON array of create/update/delete operations in one transaction.
+
+        Every operation is validated before anything is written; if any is
+        invalid the response lists the errors by index and nothing changes.
+        """
+        serializer = MemoryBulkOperationSerializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=MemoryBulkOperationSerializer.MAX_OPERATIONS
+        )
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'error': 'Invalid operations',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        results, errors = run_operations(serializer.validated_data)
+        if errors:
+            return Response({
+                'success': False,
+                'error': 'No operations were applied',
+                'errors': errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Echo the stored state of created and updated memories in one query
+        written = [result['id'] for result in results if result['op'] != 'delete']
+        rows = MemoryValuesSerializer.values(Memory.objects.filter(pk__in=written))
+        memories = {memory['id']: memory for memory in MemoryValuesSerializer(rows, many=True).data}
+        for result in results:
+            if result['id'] in memories:
+                result['memory'] = memories[result['id']]
+
+        return Response({'success': True, 'results': results})
+
+    def paginated_response(self, queryset):
+        """Serialize one keyset page of queryset, shared by list and the filtered actions."""
+        rows = MemoryValuesSerializer.values(
+            queryset, self.read_fields, extra=self.paginator.ordering
+        )
+        page = self.paginate_queryset(rows)
+        serializer = MemoryValuesSerializer(page, many=True, fields=self.read_fields)
+        return self.get_paginated_response(serializer.data)
+
+
+def site_settings_etag(request):
+    """ETag from the cached singleton's timestamp, so 304s need no query either."""
+    settings_obj = SiteSettings.load()
+    if settings_obj.updated_at is None:
+        return '"settings-default"'
+    return f'"settings-{int(settings_obj.updated_at.timestamp() * 1_000_000):x}"'
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@condition(etag_func=site_settings_etag)
 def site_settings(request):
     """Get site configuration settings."""
-    settings_obj = SiteSettings.objects.first()
-    if not settings_obj:
-        # Create default settings if none exist
-        settings_obj = SiteSettings.objects.create()
-
-    serializer = SiteSettingsSerializer(settings_obj)
+    serializer = SiteSettingsSerializer(SiteSettings.load())
     return Response(serializer.data)
 
 
+@require_http_methods(['GET', 'HEAD'])
+def universe_manifest(request):
+    """Serve the precomputed settings + public memories manifest straight from disk."""
+    variant = open_variant(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if variant is None:
+        response = JsonResponse({
+            'success': False,
+            'error': 'The manifest is being built; try again shortly'
+        }, status=503)
+        response.headers['Retry-After'] = str(math.ceil(settings.MANIFEST_BUILD_DELAY) + 1)
+        return response
+    handle, encoding = variant
+    stat = os.fstat(handle.fileno())
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        handle.close()
+    else:
+        response = FileResponse(handle, content_type='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.headers['ETag'] = etag
+    patch_vary_headers(response, ['Accept-Encoding'])
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return response
+
+
+def blob_response(request, blob, created, content_type):
+    """Upload response body for a stored blob, queueing derivatives for new ones."""
+    if created:
+        # Render thumbnails, textures and WebP/AVIF sizes in the background
+        asset = schedule_derivatives(blob.name)
+    else:
+        asset = MediaAsset.objects.filter(name=blob.name).first()
+
+    return {
+        'filename': blob.name.split('/')[-1],
+        'file_url': request.build_absolute_uri(f'/media/{blob.name}'),
+        'size': blob.size,
+        'content_type': content_type,
+        'sha256': blob.sha256,
+        'deduplicated': not created,
+        'derivatives': asset.status if asset else None
+    }
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @parser_classes([MultiPartParser, FormParser])
@@ -83,28 +344,134 @@ def upload_file(request):
     if serializer.is_valid():
         file = serializer.validated_data['file']
 
-        # Generate unique filename
-        file_extension = file.name.split('.')[-1].lower()
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
+        # Store once per distinct content; a repeat upload writes nothing
+        digest = uploaded_digest(request, 'file', file)
+        blob, created = store_upload(file, digest)
+
+        return Response(
+            blob_response(request, blob, created, file.content_type),
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+UPLOAD_EXPIRED = 'Upload expired; start a new one'
+
 
-        # Save file to media directory
-        file_path = default_storage.save(f'memories/{unique_filename}', file)
+def chunk_error_response(error):
+    """Render an uploads.ChunkError, telling the client where to resume."""
+    body = {'success': False, 'error': error.message}
+    if error.offset is not None:
+        body['offset'] = error.offset
+    response = Response(body, status=error.status_code)
+    if error.offset is not None:
+        response['Upload-Offset'] = str(error.offset)
+    return response
 
-        # Return the URL
-        file_url = request.build_absolute_uri(f'/media/{file_path}')
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def chunked_upload_init(request):
+    """Start a resumable chunked upload and return its id."""
+    serializer = ChunkedUploadInitSerializer(data=request.data)
+
+    if serializer.is_valid():
+        session = UploadSession.objects.create(user=request.user, **serializer.validated_data)
+        uploads.start(session)
         return Response({
-            'filename': unique_filename,
-            'file_url': file_url,
-            'size': file.size,
-            'content_type': file.content_type
+            'upload_id': session.pk,
+            'offset': 0,
+            'size': session.size,
+            'chunk_size': settings.CHUNKED_UPLOAD_CHUNK_SIZE
         }, status=status.HTTP_201_CREATED)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET', 'PUT', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def chunked_upload(request, upload_id):
+    """
+    Resumable upload session.
+
+    GET reports the offset to resume from; PUT appends one chunk, sent as the
+    raw request body with Upload-Offset and X-Chunk-SHA256 headers; DELETE
+    abandons the upload.
+    """
+    session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+
+    if request.method == 'DELETE':
+        uploads.discard(session)
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    if uploads.expired(session):
+        return chunk_error_response(uploads.ChunkError(UPLOAD_EXPIRED, 410))
+
+    if request.method == 'GET':
+        offset = uploads.current_offset(session)
+        if offset is None:
+            return chunk_error_response(uploads.ChunkError('Upload not found', 404))
+        response = Response({
+            'upload_id': session.pk,
+            'offset': offset,
+            'size': session.size,
+            'chunk_size': settings.CHUNKED_UPLOAD_CHUNK_SIZE
+        })
+        response['Upload-Offset'] = str(offset)
+        return response
+
+    try:
+        offset = int(request.headers['Upload-Offset'])
+        length = int(request.headers['Content-Length'])
+        checksum = request.headers['X-Chunk-SHA256']
+    except (KeyError, ValueError):
+        return Response({
+            'success': False,
+            'error': 'Upload-Offset, Content-Length and X-Chunk-SHA256 headers are required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if length > settings.CHUNKED_UPLOAD_CHUNK_SIZE:
+        return Response({
+            'success': False,
+            'error': f'Chunks cannot exceed {settings.CHUNKED_UPLOAD_CHUNK_SIZE} bytes'
+        }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    try:
+        # Read the raw body stream directly; request.data would buffer it.
+        offset = uploads.write_chunk(session, offset, request.stream, length, checksum)
+    except uploads.ChunkError as error:
+        return chunk_error_response(error)
+
+    response = Response({'offset': offset, 'size': session.size})
+    response['Upload-Offset'] = str(offset)
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def chunked_upload_finalize(request, upload_id):
+    """Assemble a completed chunked upload into media storage."""
+    session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+    if uploads.expired(session):
+        return chunk_error_response(uploads.ChunkError(UPLOAD_EXPIRED, 410))
+
+    try:
+        blob, created, content_type = uploads.finalize(session)
+    except uploads.ChunkError as error:
+        return chunk_error_response(error)
+    session.delete()
+
+    return Response(
+        blob_response(request, blob, created, content_type),
+        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+    )
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([scoped_throttle('secret')])
 def reveal_secret(request):
     """Access secret memory with optional authentication key."""
     # Simple implementation - could add password/key requirement
@@ -113,7 +480,9 @@ def reveal_secret(request):
     # For now, allow access to all secrets (can be made more secure)
     if True:  # Replace with actual key validation if needed
         secret_memories = Memory.objects.filter(is_secret=True)
-        serializer = MemorySerializer(secret_memories, many=True)
+        serializer = MemoryValuesSerializer(
+            MemoryValuesSerializer.values(secret_memories), many=True
+        )
         return Response({
             'success': True,
             'memories': serializer.data
@@ -13,4 +13,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'romantic_gallery.settings')
 
-application = get_asgi_application()
\ No newline at end of file
+django_application = get_asgi_application()
+
+# Imported once Django is set up by get_asgi_application().
+from memories import events  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """The change stream for WebSockets and its SSE path; Django for the rest."""
+    if scope['type'] == 'websocket' or (
+        scope['type'] == 'http' and scope['path'] == events.STREAM_PATH
+    ):
+        await events.application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
\ No newline at end of file
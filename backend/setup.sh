@@ -32,6 +32,10 @@ echo "🗄️ Running database migrations..."
 python manage.py makemigrations
 python manage.py migrate
 
+# Build the universe manifest (later writes rebuild it in the background)
+echo "🌌 Building the universe manifest..."
+python manage.py build_manifest
+
 # Create superuser (optional)
 echo ""
 echo "👤 Would you like to create an admin user? (y/n)"
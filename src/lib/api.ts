@@ -1,6 +1,9 @@
 import axios, { AxiosInstance, AxiosResponse } from 'axios';
 import {
   Memory,
+  MemorySummary,
+  MemoryChanges,
+  MemoryEvent,
   CreateMemoryData,
   UpdateMemoryData,
   SiteSettings,
@@ -70,17 +73,73 @@ const getCookie = (name: string): string | null => {
 // Initialize API instance
 const api = createApiInstance();
 
+// Largest page the cursor-paginated list endpoints serve.
+const MAX_PAGE_SIZE = 1000;
+
+// Collects every page of a cursor-paginated list by following `next`.
+const getAllPages = async <T>(
+  url: string,
+  params: Record<string, string | number> = {}
+): Promise<T[]> => {
+  let response = await api.get<PaginatedResponse<T>>(url, {
+    params: { page_size: MAX_PAGE_SIZE, ...params },
+  });
+  const results = [...response.data.results];
+  while (response.data.next) {
+    // `next` is an absolute URL that already carries the query parameters.
+    response = await api.get<PaginatedResponse<T>>(response.data.next);
+    results.push(...response.data.results);
+  }
+  return results;
+};
+
 // Memory API functions
 export const getMemories = async (): Promise<Memory[]> => {
   try {
-    const response = await api.get<PaginatedResponse<Memory>>('/memories/');
-    return response.data.results;
+    return await getAllPages<Memory>('/memories/');
   } catch (error) {
     console.error('Error fetching memories:', error);
     throw error;
   }
 };
 
+export const getMemorySummaries = async (): Promise<MemorySummary[]> => {
+  try {
+    return await getAllPages<MemorySummary>('/memories/', { lod: 'far' });
+  } catch (error) {
+    console.error('Error fetching memory summaries:', error);
+    throw error;
+  }
+};
+
+export const getMemoryChanges = async (since?: string): Promise<MemoryChanges> => {
+  try {
+    const response = await api.get<MemoryChanges>('/memories/changes/', {
+      params: since ? { since } : {},
+    });
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching memory changes:', error);
+    throw error;
+  }
+};
+
+// Follows the server-push change stream; returns a function that closes it.
+export const subscribeToChanges = (onEvent: (event: MemoryEvent) => void): (() => void) => {
+  const baseURL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/api';
+  const source = new EventSource(`${baseURL}/events/`, { withCredentials: true });
+  const forward = (message: MessageEvent) => onEvent(JSON.parse(message.data));
+
+  source.addEventListener('memory', forward);
+  source.addEventListener('memories', forward);
+  source.addEventListener('settings', forward);
+  // The browser reconnects by itself; either way events may have been missed.
+  source.addEventListener('resync', () => onEvent({ type: 'resync' }));
+  source.onerror = () => onEvent({ type: 'resync' });
+
+  return () => source.close();
+};
+
 export const getMemory = async (id: string): Promise<Memory> => {
   try {
     const response = await api.get<Memory>(`/memories/${id}/`);
@@ -93,8 +152,7 @@ export const getMemory = async (id: string): Promise<Memory> => {
 
 export const getFeaturedMemories = async (): Promise<Memory[]> => {
   try {
-    const response = await api.get<Memory[]>('/memories/featured/');
-    return response.data;
+    return await getAllPages<Memory>('/memories/featured/');
   } catch (error) {
     console.error('Error fetching featured memories:', error);
     throw error;
@@ -103,14 +161,25 @@ export const getFeaturedMemories = async (): Promise<Memory[]> => {
 
 export const getMemoriesByCategory = async (category: string): Promise<Memory[]> => {
   try {
-    const response = await api.get<Memory[]>(`/memories/category/?type=${category}`);
-    return response.data;
+    return await getAllPages<Memory>('/memories/category/', { type: category });
   } catch (error) {
     console.error('Error fetching memories by category:', error);
     throw error;
   }
 };
 
+export const searchMemories = async (query: string, limit = 20): Promise<Memory[]> => {
+  try {
+    const response = await api.get<PaginatedResponse<Memory>>('/memories/search/', {
+      params: { q: query, limit },
+    });
+    return response.data.results;
+  } catch (error) {
+    console.error('Error searching memories:', error);
+    throw error;
+  }
+};
+
 export const createMemory = async (data: CreateMemoryData): Promise<Memory> => {
   try {
     const response = await api.post<Memory>('/memories/', data);
@@ -262,9 +331,13 @@ export const handleApiError = (error: any): ApiError => {
 export default {
   // Memories
   getMemories,
+  getMemorySummaries,
+  getMemoryChanges,
+  subscribeToChanges,
   getMemory,
   getFeaturedMemories,
   getMemoriesByCategory,
+  searchMemories,
   createMemory,
   updateMemory,
   deleteMemory,
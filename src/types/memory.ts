@@ -20,6 +20,25 @@ export interface Memory {
   updated_at?: string;
 }
 
+// Far level of detail (?lod=far): enough to place and colour a memory.
+export type MemorySummary = Pick<Memory, 'id' | 'position' | 'category'>;
+
+// Delta sync page: pass token back as `since`; repeat while has_more.
+export interface MemoryChanges {
+  token: string;
+  has_more: boolean;
+  updated: Memory[];
+  deleted: string[];
+}
+
+// Change stream event; on 'resync' or reconnect, catch up with getMemoryChanges.
+export type MemoryEvent =
+  | { type: 'memory'; action: 'created' | 'updated'; id: string; memory: Memory }
+  | { type: 'memory'; action: 'deleted'; id: string }
+  | { type: 'memories'; action: 'changed' }
+  | { type: 'settings'; action: 'updated'; settings: SiteSettings }
+  | { type: 'resync' };
+
 export interface CreateMemoryData {
   title: string;
   caption?: string;
@@ -93,7 +112,7 @@ export interface ApiResponse<T> {
 }
 
 export interface PaginatedResponse<T> {
-  count: number;
+  count?: number;
   results: T[];
   next?: string | null;
   previous?: string | null;